@@ -0,0 +1,70 @@
+import asyncio
+from typing import Dict
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps concurrent upstream calls with a bounded, time-limited wait queue.
+
+    Up to max_concurrent callers hold a slot at once. Up to max_queue more
+    may wait, each for at most max_wait seconds. Anyone beyond that is
+    rejected immediately, so overload turns into fast errors instead of
+    ever-growing latency for every request.
+    """
+
+    def __init__(self, max_concurrent: int = 32, max_queue: int = 64, max_wait: float = 2.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def check(self) -> None:
+        """Cheap pre-flight rejection for callers that must decide before responding."""
+        if self.active >= self.max_concurrent and self.waiting >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise Overloaded("upstream queue full", self.max_wait)
+
+    async def acquire(self) -> None:
+        if self.active < self.max_concurrent and not self.waiting:
+            await self._slots.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise Overloaded("upstream queue full", self.max_wait)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise Overloaded(f"no upstream slot within {self.max_wait:g}s", self.max_wait)
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
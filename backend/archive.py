@@ -0,0 +1,240 @@
+"""
+Append-only archive of chat turns for offline analytics.
+
+Handlers call record(), which appends a dict to an in-memory buffer and
+returns; nothing on the request path touches the disk. A background task,
+started by the first record() (serverless platforms may never run startup
+hooks), flushes the buffer when it reaches max_batch records or
+max_batch_bytes, or every flush_interval seconds, writing from a worker
+thread.
+
+Each flush appends one gzip member of JSON lines to the current segment
+file (transcripts-<UTC start time>-<pid>.jsonl.gz). Concatenated gzip members
+are a valid gzip stream, so segments read back with any gzip tool, and a
+crash can at worst truncate the last batch. Segments rotate once they
+exceed max_file_bytes; with max_files set, the oldest are deleted.
+
+    python archive.py transcripts --session abc123
+    python archive.py transcripts --since 2026-01-01 --count
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from logs import configure as configure_logging, log
+
+
+SEGMENT_PREFIX = "transcripts-"
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+class TranscriptArchive:
+    def __init__(
+        self,
+        directory: str,
+        flush_interval: float = 5.0,
+        max_batch: int = 1000,
+        max_batch_bytes: int = 1024 * 1024,
+        max_file_bytes: int = 64 * 1024 * 1024,
+        max_files: int = 0,
+        max_pending: int = 100_000,
+        compresslevel: int = 6,
+    ):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_batch_bytes = max_batch_bytes
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.max_pending = max_pending
+        self.compresslevel = compresslevel
+        self._buffer: List[Dict] = []
+        self._buffer_bytes = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flushing: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._segment: Optional[str] = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.bytes_written = 0
+        self.write_errors = 0
+
+    # --- Request path ---
+    def record(self, session_id: str, message: str, response: str, source: str, **fields) -> None:
+        """Buffers one turn; never blocks. Drops (and counts) when the writer is far behind."""
+        if len(self._buffer) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._buffer.append({
+            "ts": time.time(),
+            "session_id": session_id,
+            "message": message,
+            "response": response,
+            "source": source,
+            **fields,
+        })
+        self.recorded += 1
+        self._buffer_bytes += len(message) + len(response)
+        self.start()
+        if self._wakeup is not None and (
+            len(self._buffer) >= self.max_batch or self._buffer_bytes >= self.max_batch_bytes
+        ):
+            self._wakeup.set()
+
+    # --- Background flusher ---
+    def start(self) -> None:
+        """Starts the flusher in the running loop unless it is already running there."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not loop:
+            self._flusher = loop.create_task(self.run())
+
+    async def run(self) -> None:
+        """Flushes on size or time until cancelled; a final flush happens in close()."""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self._flushing is None:
+            self._flushing = asyncio.Lock()
+        # One writer at a time, so batches land in the segment in order.
+        async with self._flushing:
+            if not self._buffer:
+                return
+            batch, self._buffer, self._buffer_bytes = self._buffer, [], 0
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except OSError as e:
+                self.write_errors += 1
+                self.dropped += len(batch)
+                log.warning("archive_write_failed", directory=self.directory, records=len(batch), error=str(e))
+
+    async def close(self) -> None:
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+        self._flusher = None
+        await self.flush()
+
+    # --- Writer thread ---
+    def _write(self, batch: List[Dict]) -> None:
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+        member = gzip.compress(lines.encode("utf-8"), compresslevel=self.compresslevel, mtime=0)
+        path = self._current_segment()
+        with open(path, "ab") as f:
+            f.write(member)
+        self.written += len(batch)
+        self.bytes_written += len(member)
+        self.flushes += 1
+
+    def _current_segment(self) -> str:
+        if self._segment is not None and os.path.exists(self._segment) \
+                and os.path.getsize(self._segment) < self.max_file_bytes:
+            return self._segment
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        # The pid keeps workers sharing the directory in separate files.
+        self._segment = os.path.join(self.directory, f"{SEGMENT_PREFIX}{stamp}-{os.getpid()}{SEGMENT_SUFFIX}")
+        if self.max_files > 0:
+            for old in segments(self.directory)[:-(self.max_files - 1) or None]:
+                os.remove(old)
+        return self._segment
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "directory": self.directory,
+            "segment": self._segment,
+            "pending": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "bytes_written": self.bytes_written,
+            "write_errors": self.write_errors,
+        }
+
+
+# --- Reading ---
+def segments(directory: str) -> List[str]:
+    """Segment paths, oldest first (the names sort by start time)."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in names
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def _read_segment(path: str) -> Iterator[Dict]:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError) as e:
+        # The file being written, or a batch cut short by a crash.
+        log.warning("archive_segment_truncated", path=path, error=str(e))
+
+
+def iter_transcripts(
+    directory: str,
+    since: Optional[float] = None,
+    session_id: Optional[str] = None,
+) -> Iterator[Dict]:
+    """Streams archived turns in write order, one segment and one line at a time."""
+    for path in segments(directory):
+        for record in _read_segment(path):
+            if since is not None and record["ts"] < since:
+                continue
+            if session_id is not None and record["session_id"] != session_id:
+                continue
+            yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--session", help="only this session_id")
+    parser.add_argument("--since", help="only turns at or after this ISO date/time (UTC)")
+    parser.add_argument("--count", action="store_true", help="print turn counts by source instead of the turns")
+    args = parser.parse_args()
+    # Turns go to stdout; keep warnings about truncated segments out of them.
+    configure_logging(path="/dev/stderr")
+
+    since = None
+    if args.since:
+        start = datetime.fromisoformat(args.since)
+        since = (start if start.tzinfo else start.replace(tzinfo=timezone.utc)).timestamp()
+    records = iter_transcripts(args.directory, since=since, session_id=args.session)
+    if args.count:
+        counts: Dict[str, int] = {}
+        sessions = set()
+        for record in records:
+            counts[record.get("source", "")] = counts.get(record.get("source", ""), 0) + 1
+            sessions.add(record["session_id"])
+        print(json.dumps({"turns": sum(counts.values()), "sessions": len(sessions), "by_source": counts}))
+    else:
+        for record in records:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    log.close()
+
+
+if __name__ == "__main__":
+    main()
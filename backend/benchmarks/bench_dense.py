@@ -0,0 +1,110 @@
+"""
+Dense (NumPy matrix-vector) retrieval throughput versus corpus size.
+
+Builds the hashing TF-IDF matrix for synthetic corpora of each size and
+measures single-query latency and queries/sec, against in-memory BM25 on
+the same chunks (up to --bm25-max). Chunks are generated on demand from
+their index, so large sizes need memory for the matrix only. With --mmap
+the matrix is written to disk and searched through a read-only memmap.
+Prints one JSON object per size.
+
+    python benchmarks/bench_dense.py --sizes 1000 10000 100000 1000000 --dim 256
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import accumulate
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval import KnowledgeIndex  # noqa: E402
+from vectors import DenseIndex  # noqa: E402
+
+
+DOMAIN_WORDS = (
+    "zordly platform school college office announcement event update notice "
+    "group message broadcast calendar attendance teacher student parent "
+    "admin report schedule video conference contact support email account"
+).split()
+
+QUERIES = [
+    "what is zordly",
+    "how do I post an announcement",
+    "will there be video calls",
+    "how can I reach support",
+    "can parents see exam results",
+]
+
+
+class SyntheticCorpus:
+    """Sequence of chunk dicts, each generated from its own index so nothing is stored."""
+
+    def __init__(self, size: int, vocabulary: int = 50_000, words_per_chunk: int = 60):
+        self.size = size
+        self.words = DOMAIN_WORDS + [f"w{i}" for i in range(vocabulary)]
+        self.cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(self.words))))
+        self.words_per_chunk = words_per_chunk
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, i: int) -> Dict:
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        rng = random.Random(i)
+        text = " ".join(rng.choices(self.words, cum_weights=self.cum_weights, k=self.words_per_chunk))
+        return {"title": f"{rng.choice(DOMAIN_WORDS).title()} {i}", "text": text}
+
+
+def measure(index, rounds: int) -> Dict:
+    latencies = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            index.search(query, 3)
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "qps": round(len(latencies) / sum(latencies), 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--bm25-max", type=int, default=100_000, help="largest size to also run BM25 on")
+    parser.add_argument("--mmap", action="store_true", help="search a memory-mapped matrix on disk")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            corpus = SyntheticCorpus(size)
+            out = os.path.join(workdir, f"vectors-{size}.npy") if args.mmap else None
+            started = time.perf_counter()
+            dense = DenseIndex.build(corpus, args.dim, out=out)
+            report = {
+                "chunks": size,
+                "dim": args.dim,
+                "matrix_mb": round(dense.matrix.nbytes / 2**20, 1),
+                "mmap": args.mmap,
+                "build_s": round(time.perf_counter() - started, 2),
+                "dense": measure(dense, args.rounds),
+            }
+            if size <= args.bm25_max:
+                bm25 = KnowledgeIndex.from_documents([corpus[i] for i in range(size)])
+                report["bm25"] = measure(bm25, args.rounds)
+            print(json.dumps(report), flush=True)
+            del dense
+
+
+if __name__ == "__main__":
+    main()
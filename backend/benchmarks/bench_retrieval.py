@@ -0,0 +1,94 @@
+"""
+Prompt size and retrieval latency versus knowledge-base size.
+
+Builds synthetic corpora shaped like Knowledge.json and compares the
+documents payload of the old "send everything" behaviour with top-k BM25
+selection. Prints one JSON object per corpus size.
+
+    python benchmarks/bench_retrieval.py --sizes 4 100 1000 10000 --top-k 3
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval import KnowledgeIndex  # noqa: E402
+
+
+WORDS = (
+    "zordly platform school college office announcement event update notice "
+    "group message broadcast calendar attendance teacher student parent "
+    "admin report schedule video conference insight productivity integration "
+    "contact support email website account login password mobile app "
+    "notification campus club exam result fee library transport hostel"
+).split()
+
+QUERIES = [
+    "what is zordly",
+    "how do I post an announcement",
+    "does zordly support video conferencing",
+    "how can I contact support",
+    "can parents see exam results",
+]
+
+
+def make_corpus(size: int, rng: random.Random):
+    docs = []
+    for i in range(size):
+        title = " ".join(rng.choices(WORDS, k=2)).title() + f" {i}"
+        text = " ".join(rng.choices(WORDS, k=rng.randint(20, 60))) + "."
+        docs.append({"title": title, "text": text})
+    return docs
+
+
+def run(size: int, top_k: int, rounds: int, rng: random.Random):
+    corpus = make_corpus(size, rng)
+
+    started = time.perf_counter()
+    index = KnowledgeIndex.from_documents(corpus)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    selected_bytes = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            docs = index.top_documents(query, top_k)
+            latencies.append((time.perf_counter() - started) * 1e6)
+            selected_bytes.append(len(json.dumps(docs)))
+
+    full_bytes = len(json.dumps(corpus))
+    latencies.sort()
+    return {
+        "corpus_size": size,
+        "top_k": top_k,
+        "build_ms": round(build_ms, 2),
+        "query_p50_us": round(statistics.median(latencies), 1),
+        "query_p95_us": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        "documents_bytes_all": full_bytes,
+        "documents_bytes_top_k": round(statistics.mean(selected_bytes)),
+        "approx_tokens_all": full_bytes // 4,
+        "approx_tokens_top_k": round(statistics.mean(selected_bytes)) // 4,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 100, 1000, 10000])
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        print(json.dumps(run(size, args.top_k, args.rounds, rng)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Memory per live session and per-operation cost of the SessionStore.
+
+Fills the store with --sessions sessions of --turns turns each, measures
+the real allocation with tracemalloc and compares it with the store's own
+estimate (which drives the global memory cap). Prints one JSON object.
+
+    python benchmarks/bench_sessions.py --sessions 100000 --turns 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sessions import SessionStore  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--message-chars", type=int, default=40)
+    parser.add_argument("--response-chars", type=int, default=300)
+    args = parser.parse_args()
+
+    session_ids = [str(uuid.uuid4()) for _ in range(args.sessions)]
+    store = SessionStore(
+        max_turns=args.turns,
+        max_sessions=args.sessions,
+        max_bytes=1 << 62,
+    )
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    for turn in range(args.turns):
+        for i, session_id in enumerate(session_ids):
+            # Build fresh strings so the measurement includes the text itself.
+            message = (f"{i}:{turn} " * args.message_chars)[:args.message_chars]
+            response = (f"{turn}:{i} " * args.response_chars)[:args.response_chars]
+            store.append(session_id, message, response)
+    append_s = time.perf_counter() - started
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for session_id in session_ids:
+        store.history(session_id)
+    history_s = time.perf_counter() - started
+
+    measured = used - baseline
+    print(json.dumps({
+        "sessions": len(store),
+        "turns_per_session": args.turns,
+        "text_bytes_per_session": args.turns * (args.message_chars + args.response_chars),
+        "measured_bytes_per_session": round(measured / len(store)),
+        "estimated_bytes_per_session": round(store.total_bytes / len(store)),
+        "measured_total_mb": round(measured / 2**20, 1),
+        "append_us": round(append_s / (args.sessions * args.turns) * 1e6, 2),
+        "history_us": round(history_s / args.sessions * 1e6, 2),
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Build time, startup time and memory of the mmap chunk store versus
+holding the corpus as a list of dicts with an in-memory KnowledgeIndex.
+
+For each size a synthetic JSONL corpus with a Zipf-distributed vocabulary
+is written to --workdir, ingested into a .zks store, then opened and
+queried. Every phase runs in a fresh interpreter so resident memory is
+measured in isolation. The in-memory baseline is skipped above
+--baseline-max chunks. Prints one JSON object per size.
+
+    python benchmarks/bench_store.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import accumulate
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from chunkstore import ChunkStore, build_store, iter_documents, split_text  # noqa: E402
+
+
+DOMAIN_WORDS = (
+    "zordly platform school college office announcement event update notice "
+    "group message broadcast calendar attendance teacher student parent "
+    "admin report schedule video conference contact support email account"
+).split()
+
+QUERIES = [
+    "what is zordly",
+    "how do I post an announcement",
+    "does zordly support video conferencing",
+    "how can I contact support",
+    "can parents see exam results",
+]
+
+
+def rss_mb() -> float:
+    """Current resident set size from /proc (Linux), falling back to peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def generate(path: str, chunks: int, max_chars: int, vocabulary: int, seed: int) -> int:
+    rng = random.Random(seed)
+    words = DOMAIN_WORDS + [f"w{i}" for i in range(vocabulary)]
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(words))))
+    written = documents = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < chunks:
+            # Documents run 0.3x-2x the chunk size, so some are split.
+            n_words = rng.randint(max_chars // 20, max_chars // 3)
+            sentences = []
+            while n_words > 0:
+                length = min(n_words, rng.randint(6, 18))
+                sentences.append(" ".join(rng.choices(words, cum_weights=cum_weights, k=length)).capitalize() + ".")
+                n_words -= length
+            doc = {"title": f"{rng.choice(DOMAIN_WORDS).title()} {documents}", "text": " ".join(sentences)}
+            written += len(split_text(doc["text"], max_chars))
+            documents += 1
+            f.write(json.dumps(doc) + "\n")
+    return documents
+
+
+def phase_build(args) -> dict:
+    stats = build_store(iter_documents(args.source), args.store, args.max_chars)
+    import resource
+    stats["build_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return stats
+
+
+def query_latency(index, rounds: int) -> dict:
+    latencies = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            index.top_documents(query, 3)
+            latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {"p50": round(statistics.median(latencies), 3), "p95": round(latencies[int(len(latencies) * 0.95) - 1], 3)}
+
+
+def phase_open(args) -> dict:
+    before = rss_mb()
+    started = time.perf_counter()
+    store = ChunkStore(args.store)
+    open_ms = (time.perf_counter() - started) * 1000
+    after_open = rss_mb()
+    latency = query_latency(store, args.rounds)
+    return {
+        "open_ms": round(open_ms, 2),
+        "rss_after_open_mb": round(after_open - before, 1),
+        "rss_after_queries_mb": round(rss_mb() - before, 1),
+        "query_ms": latency,
+    }
+
+
+def phase_baseline(args) -> dict:
+    from retrieval import KnowledgeIndex
+    from chunkstore import chunk_documents
+
+    before = rss_mb()
+    started = time.perf_counter()
+    chunks = list(chunk_documents(iter_documents(args.source), args.max_chars))
+    index = KnowledgeIndex.from_documents(chunks)
+    startup_ms = (time.perf_counter() - started) * 1000
+    return {
+        "startup_ms": round(startup_ms, 1),
+        "rss_mb": round(rss_mb() - before, 1),
+        "query_ms": query_latency(index, args.rounds),
+    }
+
+
+def run_phase(phase: str, args, source: str, store: str) -> dict:
+    command = [
+        sys.executable, os.path.abspath(__file__), "--phase", phase, "--source", source, "--store", store,
+        "--max-chars", str(args.max_chars), "--rounds", str(args.rounds),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="chunk counts")
+    parser.add_argument("--max-chars", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--baseline-max", type=int, default=100_000, help="largest size to also load in memory")
+    parser.add_argument("--workdir", default=None, help="where corpora and stores are written (default: a temp dir)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--phase", choices=["build", "open", "baseline"], help=argparse.SUPPRESS)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        print(json.dumps({"build": phase_build, "open": phase_open, "baseline": phase_baseline}[args.phase](args)))
+        return
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for size in args.sizes:
+            source = os.path.join(workdir, f"corpus-{size}.jsonl")
+            store = os.path.join(workdir, f"corpus-{size}.zks")
+            started = time.perf_counter()
+            documents = generate(source, size, args.max_chars, args.vocabulary, args.seed)
+            report = {
+                "target_chunks": size,
+                "documents": documents,
+                "source_mb": round(os.path.getsize(source) / 2**20, 1),
+                "generate_s": round(time.perf_counter() - started, 1),
+            }
+            build = run_phase("build", args, source, store)
+            report.update({
+                "chunks": build["chunks"],
+                "terms": build["terms"],
+                "store_mb": round(build["bytes"] / 2**20, 1),
+                "build_s": build["build_s"],
+                "build_peak_rss_mb": build["build_peak_rss_mb"],
+                "store": run_phase("open", args, source, store),
+            })
+            if size <= args.baseline_max:
+                report["in_memory"] = run_phase("baseline", args, source, store)
+            print(json.dumps(report), flush=True)
+            os.remove(source)
+            os.remove(store)
+
+
+if __name__ == "__main__":
+    main()
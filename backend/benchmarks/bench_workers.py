@@ -0,0 +1,144 @@
+"""
+Throughput of serve.py versus worker count.
+
+For each worker count, starts `serve.py --workers N` on a free port and
+drives it from --clients load-generator processes, each keeping
+--concurrency requests in flight for --duration seconds. Requests are
+first turns answered locally (FAQ hits and relevance-gated refusals), so
+the numbers measure the server's own JSON, retrieval, session and shared
+state work rather than the upstream model. Every request carries a
+session_id, so each one also writes its turn to the shared store.
+
+Prints one JSON object per worker count, with speedup over the first.
+Scaling is bounded by the CPU cores available to server and clients.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MESSAGES = [
+    "What is Zordly?",
+    "How can I contact Zordly?",
+    "What features does Zordly have?",
+    "What is the weather in Paris today?",
+    "Who won the football match yesterday?",
+    "Recommend a good pasta recipe",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _drive(url: str, concurrency: int, duration: float, client_id: int) -> List[float]:
+    latencies: List[float] = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def loop(worker: int):
+            n = 0
+            while time.perf_counter() < deadline:
+                message = MESSAGES[(worker + n) % len(MESSAGES)]
+                started = time.perf_counter()
+                response = await client.post("/chat", json={"message": message, "session_id": f"bench-{client_id}-{worker}-{n}"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+                n += 1
+
+        await asyncio.gather(*(loop(i) for i in range(concurrency)))
+    return latencies
+
+
+def _client(args) -> List[float]:
+    return asyncio.run(_drive(*args))
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with {process.returncode}")
+        try:
+            # /faq/stats waits for initialization, so every worker that
+            # answers it is warm; poll a few times to reach several workers.
+            if all(httpx.get(f"{url}/faq/stats", timeout=5).status_code == 200 for _ in range(8)):
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def run(workers: int, args, workdir: str) -> Dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "COHERE_API_KEY": os.getenv("COHERE_API_KEY", "benchmark"),
+        "LOG_LEVEL": "warning",
+        "ARCHIVE_DIR": os.path.join(workdir, f"transcripts-{workers}"),
+    }
+    state = os.path.join(workdir, f"state-{workers}.db")
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1", "--state", state],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(url, process)
+        # Warm every worker (imports, caches, connection setup) before timing.
+        _client((url, args.concurrency, 1.0, -1))
+        jobs = [(url, args.concurrency, args.duration, i) for i in range(args.clients)]
+        started = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(_client, jobs)
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(30)
+
+    latencies = sorted(latency for result in results for latency in result)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 1) // 2), help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight per client")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(json.dumps({"cpus": os.cpu_count(), "clients": args.clients, "concurrency": args.concurrency}), flush=True)
+    baseline = None
+    with tempfile.TemporaryDirectory() as workdir:
+        for workers in args.workers:
+            report = run(workers, args, workdir)
+            baseline = baseline or report["rps"]
+            report["speedup"] = round(report["rps"] / baseline, 2)
+            print(json.dumps(report), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Cold-start guard: importing main must stay under an import-time budget.
+
+Imports main in --runs fresh interpreters (as a serverless cold start
+would), takes the median wall time and exits non-zero when it exceeds
+--budget seconds or when a module that should load lazily (provider SDKs,
+numpy) was imported. Prints one JSON object including the slowest
+top-level imports from `python -X importtime`.
+
+    python benchmarks/check_import_time.py --budget 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = ("cohere", "google.generativeai", "numpy")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def run_probe(env: Dict[str, str], importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE % (LAZY_MODULES,)]
+    return subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+
+
+def slowest_imports(stderr: str, limit: int) -> List[Dict]:
+    """Modules imported directly by main, from -X importtime output, by cumulative time."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Names are indented two spaces per nesting level below " main".
+        if len(name) - len(name.lstrip()) != 3 or not cumulative.strip().isdigit():
+            continue
+        rows.append({"module": name.strip(), "ms": round(int(cumulative) / 1000, 1)})
+    return sorted(rows, key=lambda row: row["ms"], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=1.0, help="max median import time in seconds")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--provider", default="cohere", help="LLM_PROVIDER to import with")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({"LLM_PROVIDER": args.provider, "COHERE_API_KEY": "import-check", "GEMINI_API_KEY": "import-check"})
+
+    samples = []
+    loaded = set()
+    for _ in range(args.runs):
+        result = json.loads(run_probe(env).stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded.update(result["loaded"])
+    median = statistics.median(samples)
+
+    report = {
+        "provider": args.provider,
+        "runs": args.runs,
+        "median_s": round(median, 3),
+        "max_s": round(max(samples), 3),
+        "budget_s": args.budget,
+        "eagerly_loaded": sorted(loaded),
+        "slowest_imports": slowest_imports(run_probe(env, importtime=True).stderr, args.top),
+        "ok": median <= args.budget and not loaded,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Checks that abandoned and stalled upstream streams cannot wedge the
+circuit breaker or hold admission slots.
+
+Runs stream_llm_with_retry against the fake provider in three scenarios:
+
+    abandoned probe  the breaker is half-open and the caller (a follow-up
+                     on /chat/stream or /ws/chat whose client went away)
+                     closes the stream after one chunk; the next call must
+                     be allowed to probe and close the breaker
+    stalled stream   the provider stops sending after the first chunk; the
+                     call must fail with 502 after idle_timeout and give
+                     its admission slot back
+    cancelled call   the task waiting for the first token is cancelled
+
+Prints one JSON object and exits non-zero if any scenario fails.
+
+    python benchmarks/check_resilience.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+os.environ.update({"LLM_PROVIDER": "fake", "ARCHIVE_DIR": "", "LOG_LEVEL": "error"})
+
+import main as server  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from providers import FakeProvider  # noqa: E402
+from resilience import CircuitBreaker, RetryPolicy  # noqa: E402
+
+QUESTION = "How do teachers post events on Zordly?"
+HISTORY = [("What is Zordly?", "A school communication platform.")]
+
+
+def force_half_open() -> None:
+    breaker = server.UPSTREAM_BREAKER
+    breaker.state = CircuitBreaker.OPEN
+    breaker.opened_at = time.monotonic() - breaker.recovery_time - 1
+
+
+async def read_all(stream) -> str:
+    return "".join([chunk async for chunk in stream])
+
+
+async def abandoned_probe() -> Dict:
+    server.LLM = FakeProvider(first_token_latency=0, tokens_per_second=1000)
+    force_half_open()
+    stream = server.stream_llm_with_retry(QUESTION, history=HISTORY)
+    await stream.__anext__()
+    await stream.aclose()
+    after_close = server.UPSTREAM_BREAKER.snapshot()
+    try:
+        next_call = bool(await read_all(server.stream_llm_with_retry(QUESTION, history=HISTORY)))
+    except HTTPException as e:
+        next_call = e.status_code
+    return {
+        "after_close": after_close,
+        "next_call": next_call,
+        "state": server.UPSTREAM_BREAKER.state,
+        "ok": not after_close["probe_in_flight"] and server.UPSTREAM_BREAKER.state == CircuitBreaker.CLOSED,
+    }
+
+
+async def stalled_stream() -> Dict:
+    # One word every 5s: the first arrives at once, the second never in time.
+    server.LLM = FakeProvider(first_token_latency=0, tokens_per_second=0.2)
+    policy = RetryPolicy(max_attempts=1, deadline=2, idle_timeout=0.2)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    status = None
+    try:
+        await read_all(server.stream_llm_with_retry(QUESTION, history=HISTORY, policy=policy))
+    except HTTPException as e:
+        status = e.status_code
+    elapsed = loop.time() - started
+    return {
+        "status": status,
+        "seconds": round(elapsed, 2),
+        "admission_active": server.ADMISSION.active,
+        "ok": status == 502 and elapsed < 1 and server.ADMISSION.active == 0,
+    }
+
+
+async def cancelled_call() -> Dict:
+    server.LLM = FakeProvider(first_token_latency=5, tokens_per_second=1000)
+    force_half_open()
+    task = asyncio.create_task(read_all(server.stream_llm_with_retry(QUESTION, history=HISTORY)))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    snapshot = server.UPSTREAM_BREAKER.snapshot()
+    return {
+        "breaker": snapshot,
+        "admission_active": server.ADMISSION.active,
+        "ok": not snapshot["probe_in_flight"] and server.ADMISSION.active == 0,
+    }
+
+
+async def run() -> Dict:
+    await server.ensure_ready()
+    return {
+        "abandoned_probe": await abandoned_probe(),
+        "stalled_stream": await stalled_stream(),
+        "cancelled_call": await cancelled_call(),
+    }
+
+
+def main():
+    report = asyncio.run(run())
+    report["ok"] = all(result["ok"] for result in report.values())
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Checks that the shared SQLite stores recover when another worker holds
+the database write lock.
+
+A second connection holds BEGIN IMMEDIATE while this process appends to a
+session and caches a response. Both must fail within about BUSY_TIMEOUT
+(not hang), and once the lock is released every read and write on the
+same store objects must work again. Then the app (with the fake provider)
+answers /chat and /chat/stream while the lock is held: the answers must
+still be returned, only their bookkeeping is lost.
+
+Prints one JSON object and exits non-zero if any step fails.
+
+    python benchmarks/check_shared.py
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from shared import BUSY_TIMEOUT, SharedResponseCache, SharedSessionStore  # noqa: E402
+
+
+def attempt(fn: Callable[[], Any], timeout: float = 5.0) -> Dict:
+    """Runs fn in a thread so a wedged lock shows up as a timeout, not a hang."""
+    result: Dict[str, Any] = {}
+
+    def target():
+        try:
+            result["value"] = fn()
+        except Exception as e:
+            result["error"] = type(e).__name__
+
+    started = time.monotonic()
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    result["seconds"] = round(time.monotonic() - started, 3)
+    result["hung"] = thread.is_alive()
+    return result
+
+
+def app_under_lock(path: str) -> Dict:
+    os.environ.update({
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": "0",
+        "FAKE_LLM_TOKENS_PER_SECOND": "0",
+        "ARCHIVE_DIR": "",
+        "LOG_LEVEL": "error",
+        "SHARED_STATE_PATH": path,
+    })
+    from fastapi.testclient import TestClient
+
+    import main as server
+
+    question = {"message": "How do teachers post events on Zordly?", "session_id": "locked"}
+    other = sqlite3.connect(path, isolation_level=None)
+    with TestClient(server.app) as client:
+        client.get("/health")
+        other.execute("BEGIN IMMEDIATE")
+        chat = attempt(lambda: client.post("/chat", json=question).status_code)
+        stream = attempt(lambda: client.post("/chat/stream", json=question).text)
+        other.execute("ROLLBACK")
+        after = attempt(lambda: client.post("/chat", json=question).status_code)
+    other.close()
+    stream_done = "event: done" in stream.pop("value", "")
+    return {"chat": chat, "stream": {**stream, "done": stream_done}, "after": after}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        sessions = SharedSessionStore(path)
+        cache = SharedResponseCache(path)
+        other = sqlite3.connect(path, isolation_level=None)
+
+        other.execute("BEGIN IMMEDIATE")
+        locked = {
+            "append": attempt(lambda: sessions.append("s", "hi", "hello")),
+            "set": attempt(lambda: cache.set("k", "v")),
+        }
+        other.execute("ROLLBACK")
+        released = {
+            "history": attempt(lambda: sessions.history("s")),
+            "append": attempt(lambda: sessions.append("s", "hi", "hello")),
+            "set": attempt(lambda: cache.set("k", "v")),
+            "get": attempt(lambda: cache.get("k")),
+            "in_transaction": sessions.db.in_transaction or cache.db.in_transaction,
+        }
+        other.close()
+        app = app_under_lock(path)
+
+    report = {"busy_timeout": BUSY_TIMEOUT, "locked": locked, "released": released, "app": app}
+    report["ok"] = (
+        all(step.get("error") == "OperationalError" and not step["hung"] for step in locked.values())
+        and not any(step["hung"] or "error" in step for step in released.values() if isinstance(step, dict))
+        and released["get"]["value"] == "v"
+        and not released["in_transaction"]
+        and app["chat"].get("value") == 200
+        and app["stream"]["done"]
+        and app["after"].get("value") == 200
+    )
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Checks that /chat, /chat/stream and /reset-chat behave the same on every
+state backend.
+
+Runs one scripted conversation against the app (with the fake provider)
+once per backend: memory, and redis with each serializer against the
+stand-in server from resp_server.py (or a real server with --redis-url).
+The script covers cache hits across sessions, follow-ups that see their
+history, resets, FAQ answers, streamed cache hits and a conversation long
+enough to be folded into a rolling summary. Each run records the
+source and answer of every step. The check fails unless all runs match.
+
+    python benchmarks/check_storage.py
+    python benchmarks/check_storage.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ON_TOPIC = "How do teachers post events on Zordly?"
+FOLLOW_UP = "and parents?"
+
+
+def conversation() -> List[Dict]:
+    """Runs in a child process whose environment selects the backend."""
+    sys.path.insert(0, BACKEND_DIR)
+    from fastapi.testclient import TestClient
+
+    import main
+
+    steps = []
+
+    def chat(label: str, message: str, session_id: str) -> None:
+        response = main_client.post("/chat", json={"message": message, "session_id": session_id})
+        body = response.json()
+        steps.append({
+            "step": label,
+            "status": response.status_code,
+            "source": body.get("source"),
+            "cached": body.get("cached"),
+            "answer": hashlib.sha1(body.get("response", "").encode()).hexdigest()[:12],
+        })
+
+    def reset(label: str, session_id: str) -> None:
+        response = main_client.post(f"/reset-chat/{session_id}")
+        steps.append({"step": label, "status": response.status_code, "message": response.json()["message"]})
+
+    with TestClient(main.app) as main_client:
+        chat("first turn", ON_TOPIC, "a")
+        chat("same question, new session", ON_TOPIC, "b")
+        chat("follow-up sees history", FOLLOW_UP, "a")
+        reset("reset", "a")
+        reset("reset again", "a")
+        chat("after reset it is a first turn", FOLLOW_UP, "a")
+        chat("faq", "What is Zordly?", "c")
+        stream = main_client.post("/chat/stream", json={"message": ON_TOPIC, "session_id": "d"})
+        done = json.loads(stream.text.split("event: done\ndata: ")[1].split("\n")[0])
+        steps.append({"step": "stream cache hit", "status": stream.status_code, "source": done["source"]})
+        cache_stats = main_client.get("/cache/stats").json()
+        # FAQ answers and gated refusals never consult the cache.
+        steps.append({"step": "cache stats", "hits": cache_stats["hits"], "misses": cache_stats["misses"]})
+        for turn in range(main.SESSION_MAX_TURNS):
+            chat(f"long conversation {turn}", ON_TOPIC if turn == 0 else f"{FOLLOW_UP} ({turn})", "e")
+            # Folds run in the background after the response; wait for them
+            # so every backend sees the same history on the next turn.
+            while main_client.get("/sessions/e/summary").json()["pending"]:
+                time.sleep(0.01)
+        report = main_client.get("/sessions/e/summary").json()
+        steps.append({
+            "step": "summary",
+            "turns_summarized": report["turns_summarized"],
+            "recent_turns": report["recent_turns"],
+            "summary": hashlib.sha1((report["summary"] or "").encode()).hexdigest()[:12],
+            "tokens_saved": report["tokens_saved"],
+        })
+    return steps
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run(env: Dict[str, str]) -> List[Dict]:
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        cwd=BACKEND_DIR, env={**os.environ, **env}, capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="use this server instead of the stand-in (keys get a unique prefix)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(conversation()))
+        return
+
+    base = {
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": "0",
+        "FAKE_LLM_TOKENS_PER_SECOND": "0",
+        "ARCHIVE_DIR": "",
+        "LOG_LEVEL": "warning",
+    }
+    stand_in = None
+    redis_url = args.redis_url
+    if not redis_url:
+        port = free_port()
+        stand_in = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "resp_server.py"), "--port", str(port)],
+            stdout=subprocess.DEVNULL,
+        )
+        redis_url = f"redis://127.0.0.1:{port}/0"
+        time.sleep(0.5)
+    try:
+        runs = {"memory": run({**base, "STATE_BACKEND": "memory"})}
+        for serializer in ("json", "pickle"):
+            # A fresh key prefix per run, so runs do not see each other's state.
+            runs[f"redis/{serializer}"] = run({
+                **base,
+                "STATE_BACKEND": "redis",
+                "REDIS_URL": redis_url,
+                "STATE_SERIALIZER": serializer,
+                "STATE_KEY_PREFIX": f"check-{serializer}-{os.getpid()}:",
+            })
+    finally:
+        if stand_in is not None:
+            stand_in.terminate()
+
+    expected = runs["memory"]
+    report = {
+        "redis_url": redis_url,
+        "steps": expected,
+        "matches": {name: steps == expected for name, steps in runs.items()},
+    }
+    for name, steps in runs.items():
+        if steps != expected:
+            report.setdefault("differences", {})[name] = [
+                {"expected": want, "got": got} for want, got in zip(expected, steps) if want != got
+            ]
+    report["ok"] = all(report["matches"].values())
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
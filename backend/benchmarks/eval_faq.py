@@ -0,0 +1,87 @@
+"""
+Offline evaluation of the FAQ matcher (FAQ_MIN_SIMILARITY).
+
+Matches every message of a labeled JSONL sample ({"message", "expected"},
+where expected is an FAQ entry id, or null when the message must go to
+the model) and reports, per similarity threshold:
+
+    served_wrong  messages answered with a canned answer they did not ask
+                  for; these never reach the model, so this must be 0
+    missed        FAQ questions left to the model (costs a call, not
+                  correctness)
+
+Exits non-zero when the chosen threshold serves any wrong answer. The
+sample includes near-miss phrasings ("What features does Zordly lack?")
+that score high on trigram similarity but ask something else.
+
+    python benchmarks/eval_faq.py --threshold 0.8 --misses
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from faq import FAQMatcher  # noqa: E402
+
+
+def matched_id(matcher: FAQMatcher, message: str) -> Optional[str]:
+    match = matcher.match(message)
+    return match[0].id if match else None
+
+
+def evaluate(faq_path: str, examples: List[Dict], threshold: float) -> Dict:
+    matcher = FAQMatcher.from_file(faq_path, min_similarity=threshold)
+    served_wrong = missed = correct = 0
+    for example in examples:
+        got = matched_id(matcher, example["message"])
+        if got == example["expected"]:
+            correct += 1
+        elif got is None:
+            missed += 1
+        else:
+            served_wrong += 1
+    return {
+        "threshold": threshold,
+        "accuracy": round(correct / len(examples), 3) if examples else 1.0,
+        "served_wrong": served_wrong,
+        "missed": missed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", default=os.path.join(BACKEND_DIR, "benchmarks", "faq_sample.jsonl"))
+    parser.add_argument("--faq", default=os.path.join(BACKEND_DIR, "faq.json"))
+    parser.add_argument("--threshold", type=float, default=0.8, help="threshold to check and report misses for")
+    parser.add_argument("--misses", action="store_true", help="list messages matched differently than expected")
+    args = parser.parse_args()
+
+    with open(args.sample, encoding="utf-8") as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+
+    thresholds = sorted({round(t / 20, 2) for t in range(10, 21)} | {args.threshold})
+    chosen = evaluate(args.faq, examples, args.threshold)
+    report = {
+        "examples": len(examples),
+        "faq_questions": sum(1 for example in examples if example["expected"]),
+        "chosen": chosen,
+        "sweep": [evaluate(args.faq, examples, t) for t in thresholds],
+    }
+    if args.misses:
+        matcher = FAQMatcher.from_file(args.faq, min_similarity=args.threshold)
+        report["misses"] = [
+            {"message": example["message"], "expected": example["expected"], "got": got}
+            for example in examples
+            for got in [matched_id(matcher, example["message"])]
+            if got != example["expected"]
+        ]
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if chosen["served_wrong"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Offline evaluation of the local relevance gate (RELEVANCE_THRESHOLD).
+
+Scores every message of a labeled JSONL sample ({"message", "relevant"})
+against the knowledge base and reports, per threshold, how well the
+refusal decision separates off-topic from on-topic messages:
+
+    precision  refused messages that really were off-topic
+    recall     off-topic messages that were refused
+    on_topic_refused  on-topic messages wrongly refused (lost answers)
+
+Messages without content terms (greetings) always pass, as in the server.
+Prints one JSON object; --misses lists the misclassified messages at the
+chosen threshold.
+
+    python benchmarks/eval_relevance.py --threshold 0.25 --misses
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from knowledge import KnowledgeManager  # noqa: E402
+
+
+def evaluate(scored: List[Tuple[Dict, Optional[float]]], threshold: float) -> Dict:
+    tp = fp = fn = tn = 0
+    for example, score in scored:
+        refused = score is not None and score < threshold
+        if refused and not example["relevant"]:
+            tp += 1
+        elif refused:
+            fp += 1
+        elif not example["relevant"]:
+            fn += 1
+        else:
+            tn += 1
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    return {
+        "threshold": threshold,
+        "precision": round(precision, 3),
+        "recall": round(recall, 3),
+        "f1": round(2 * precision * recall / (precision + recall), 3) if precision + recall else 0.0,
+        "on_topic_refused": fp,
+        "off_topic_passed": fn,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", default=os.path.join(BACKEND_DIR, "benchmarks", "relevance_sample.jsonl"))
+    parser.add_argument("--knowledge", default=os.path.join(BACKEND_DIR, "Knowledge.json"))
+    parser.add_argument("--threshold", type=float, default=0.25, help="threshold to report misses for")
+    parser.add_argument("--misses", action="store_true", help="list misclassified messages")
+    args = parser.parse_args()
+
+    knowledge = KnowledgeManager(args.knowledge)
+    with open(args.sample, encoding="utf-8") as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    scored = [(example, knowledge.relevance(example["message"])) for example in examples]
+
+    thresholds = sorted({round(t / 20, 2) for t in range(1, 21)} | {args.threshold})
+    report = {
+        "knowledge_version": knowledge.version,
+        "examples": len(examples),
+        "on_topic": sum(1 for example in examples if example["relevant"]),
+        "chosen": evaluate(scored, args.threshold),
+        "sweep": [evaluate(scored, t) for t in thresholds],
+    }
+    if args.misses:
+        report["misses"] = [
+            {"message": example["message"], "relevant": example["relevant"], "score": score}
+            for example, score in scored
+            if (score is not None and score < args.threshold) == example["relevant"]
+        ]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Load test for the chat API against the offline fake LLM provider.
+
+Starts `uvicorn main:app` in a subprocess with LLM_PROVIDER=fake (unless
+--url points at an already running server), drives /chat or /chat/stream
+at a fixed concurrency, and prints a JSON report with throughput,
+latency percentiles, time-to-first-byte and error rates. Save the report
+with --output and diff it across commits.
+
+    python benchmarks/loadtest.py --endpoint /chat --concurrency 50 --duration 20
+    python benchmarks/loadtest.py --endpoint /chat/stream --token-latency 0.02 --unique 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "What is Zordly?",
+    "What features does Zordly have?",
+    "How can I contact Zordly?",
+    "What are the future plans for Zordly?",
+    "Can I post announcements and events?",
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index], 2)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(port: int, args, extra_env: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": str(args.first_token_latency),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(1 / args.token_latency if args.token_latency > 0 else 0),
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+    })
+    env.update(extra_env)
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not become ready")
+
+
+class Results:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.ttfb_ms: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.response_bytes = 0
+
+    def record(self, status: str, latency_ms: float, ttfb_ms: Optional[float], size: int) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == "200":
+            self.latencies_ms.append(latency_ms)
+            if ttfb_ms is not None:
+                self.ttfb_ms.append(ttfb_ms)
+            self.response_bytes += size
+
+
+async def one_request(client: httpx.AsyncClient, endpoint: str, payload: Dict, results: Results) -> None:
+    started = time.perf_counter()
+    ttfb = None
+    size = 0
+    stream_error = False
+    try:
+        async with client.stream("POST", endpoint, json=payload) as response:
+            async for chunk in response.aiter_raw():
+                if ttfb is None:
+                    ttfb = (time.perf_counter() - started) * 1000
+                size += len(chunk)
+                stream_error = stream_error or b"event: error" in chunk
+            # SSE errors arrive after a 200 status line, so count them separately.
+            status = "stream_error" if stream_error else str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results.record(status, (time.perf_counter() - started) * 1000, ttfb, size)
+
+
+async def worker(client, args, results: Results, stop_at: float, counter: List[int], rng: random.Random) -> None:
+    while time.monotonic() < stop_at and (args.requests is None or counter[0] < args.requests):
+        counter[0] += 1
+        message = rng.choice(QUESTIONS)
+        if rng.random() < args.unique:
+            message = f"{message} (#{counter[0]})"
+        payload = {"message": message}
+        if args.sessions:
+            payload["session_id"] = f"load-{rng.randrange(args.sessions)}"
+        await one_request(client, args.endpoint, payload, results)
+
+
+async def run(args) -> Dict:
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        server = start_server(port, args, dict(kv.split("=", 1) for kv in args.env))
+        base_url = f"http://127.0.0.1:{port}"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            await wait_until_ready(client)
+            results = Results()
+            counter = [0]
+            rng = random.Random(args.seed)
+            started = time.monotonic()
+            stop_at = started + args.duration
+            await asyncio.gather(*[
+                worker(client, args, results, stop_at, counter, random.Random(rng.random()))
+                for _ in range(args.concurrency)
+            ])
+            elapsed = time.monotonic() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    total = sum(results.statuses.values())
+    ok = results.statuses.get("200", 0)
+    latencies = sorted(results.latencies_ms)
+    ttfb = sorted(results.ttfb_ms)
+    return {
+        "commit": git_commit(),
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "upstream": None if args.url else {
+            "first_token_latency_s": args.first_token_latency,
+            "token_latency_s": args.token_latency,
+            "error_rate": args.error_rate,
+        },
+        "requests": total,
+        "succeeded": ok,
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "statuses": results.statuses,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(latencies[-1], 2) if latencies else None,
+        },
+        "ttfb_ms": {
+            "p50": percentile(ttfb, 50),
+            "p95": percentile(ttfb, 95),
+            "p99": percentile(ttfb, 99),
+        },
+        "mean_response_bytes": round(results.response_bytes / ok) if ok else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", default="/chat", choices=["/chat", "/chat/stream"])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many requests")
+    parser.add_argument("--unique", type=float, default=0.0, help="fraction of messages made unique (defeats the cache)")
+    parser.add_argument("--sessions", type=int, default=0, help="spread requests over N session ids (0 = stateless)")
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.02, help="seconds between fake tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra server setting")
+    parser.add_argument("--url", default=None, help="target a running server instead of starting one")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
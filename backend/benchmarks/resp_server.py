@@ -0,0 +1,185 @@
+"""
+Local stand-in for a Redis server, for checks and benchmarks of the redis
+state backend without installing Redis.
+
+Speaks RESP2 over TCP and implements the commands storage.py and resp.py
+use (PING, GET, SET [PX|EX], DEL, EXISTS, RPUSH, LRANGE, LTRIM,
+PEXPIRE, PTTL, DBSIZE, FLUSHDB, SELECT, AUTH). Keys expire lazily on
+access. Everything is in memory in one process; it is not a Redis
+replacement.
+
+    python benchmarks/resp_server.py --port 6390
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resp import read_reply  # noqa: E402
+
+
+def _encode(value: Any) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return b"-ERR %s\r\n" % str(value).encode("utf-8")
+    if isinstance(value, bool):
+        return b":%d\r\n" % value
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode("utf-8")
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+
+
+def _index(i: int, length: int) -> int:
+    return i + length if i < 0 else i
+
+
+class StandInRedis:
+    def __init__(self):
+        self.data: Dict[bytes, Any] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.commands = 0
+
+    def _live(self, key: bytes) -> Optional[Any]:
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _set_ttl(self, key: bytes, ms: int) -> None:
+        self.expires[key] = time.monotonic() + ms / 1000
+
+    def execute(self, args: List[bytes]) -> Any:
+        self.commands += 1
+        name = args[0].upper().decode()
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return Exception(f"unknown command '{name}'")
+        try:
+            return handler(*args[1:])
+        except (TypeError, ValueError) as e:
+            return Exception(f"wrong arguments for '{name}': {e}")
+
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_auth(self, *args):
+        return "OK"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_get(self, key):
+        value = self._live(key)
+        if isinstance(value, list):
+            return Exception("WRONGTYPE")
+        return value
+
+    def cmd_set(self, key, value, *options):
+        self.data[key] = value
+        self.expires.pop(key, None)
+        options = [option.upper() for option in options]
+        for unit, scale in ((b"PX", 1), (b"EX", 1000)):
+            if unit in options:
+                self._set_ttl(key, int(options[options.index(unit) + 1]) * scale)
+        return "OK"
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                removed += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(self._live(key) is not None for key in keys)
+
+    def cmd_rpush(self, key, *values):
+        items = self._live(key)
+        if items is None:
+            items = self.data[key] = []
+        items.extend(values)
+        return len(items)
+
+    def cmd_lrange(self, key, start, stop):
+        items = self._live(key) or []
+        start, stop = _index(int(start), len(items)), _index(int(stop), len(items))
+        return items[max(start, 0):stop + 1]
+
+    def cmd_ltrim(self, key, start, stop):
+        items = self._live(key)
+        if items is not None:
+            start, stop = _index(int(start), len(items)), _index(int(stop), len(items))
+            items[:] = items[max(start, 0):stop + 1]
+            if not items:
+                self.cmd_del(key)
+        return "OK"
+
+    def cmd_pexpire(self, key, ms):
+        if self._live(key) is None:
+            return 0
+        self._set_ttl(key, int(ms))
+        return 1
+
+    def cmd_pttl(self, key):
+        if self._live(key) is None:
+            return -2
+        expires_at = self.expires.get(key)
+        return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+
+    def cmd_dbsize(self):
+        return sum(self._live(key) is not None for key in list(self.data))
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return "OK"
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    command = await read_reply(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                writer.write(_encode(self.execute(command)))
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+async def start(host: str = "127.0.0.1", port: int = 0) -> Tuple[asyncio.AbstractServer, StandInRedis]:
+    """Starts a server in the running loop; port 0 picks a free one (see server.sockets)."""
+    redis = StandInRedis()
+    server = await asyncio.start_server(redis.handle, host, port)
+    return server, redis
+
+
+async def _serve(host: str, port: int) -> None:
+    server, _ = await start(host, port)
+    print(f"RESP stand-in listening on {host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
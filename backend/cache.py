@@ -0,0 +1,86 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+_WS_RE = re.compile(r"\s+")
+_TRAILING_PUNCT = " ?!.,;:"
+
+
+def normalize_message(message: str) -> str:
+    """Case-fold and collapse whitespace so trivially different phrasings share a key."""
+    return _WS_RE.sub(" ", message.lower()).strip().rstrip(_TRAILING_PUNCT)
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache with a per-entry TTL.
+
+    Entries live in an OrderedDict ordered from least to most recently used,
+    so lookups, inserts and evictions are all O(1). Expired entries are
+    only dropped when they reach the LRU end.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            # Expired entries stay until LRU eviction so get_stale can
+            # still serve them while upstream is down.
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: Hashable) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.stale_hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: str) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_hits": self.stale_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,336 @@
+"""
+On-disk knowledge store for corpora too large to hold as a list of dicts.
+
+Documents are streamed in from JSON or JSONL, split into chunks of at most
+max_chars, and written to one append-only file:
+
+    MAGIC | chunk records | offsets | chunk lengths | postings | term table | trailer
+
+Each record is the chunk's UTF-8 "title<US>text". Offsets (uint64), chunk
+lengths in terms (uint32) and each term's postings (uint32 chunk ids, then
+uint16 term frequencies) are little-endian arrays. The term table is the
+UTF-8 terms in byte order followed by their offsets, postings positions
+and document frequencies, so a term is found by binary search.
+
+ChunkStore maps the file read-only and parses nothing up front: offsets,
+postings, terms and text stay in the page cache and are read on demand,
+so opening a store costs the same at 10k chunks as at 1M.
+
+    python chunkstore.py Knowledge.json knowledge.zks --max-chars 1000
+"""
+import argparse
+import bisect
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import textwrap
+import time
+from array import array
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from retrieval import bm25_idf, document_terms, tokenize
+
+
+MAGIC = b"ZKS1"
+STORE_SUFFIX = ".zks"
+SEPARATOR = "\x1f"
+# chunks, offsets, lengths, terms, term offsets, term postings, term dfs, total terms, version, magic
+TRAILER = struct.Struct("<QQQQQQQQ12s4s")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+# --- Ingest ---
+def iter_json_array(f: IO[str], read_size: int = 1 << 16) -> Iterator[Dict]:
+    """Yields the items of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = f.read(read_size).lstrip()
+    if not buf.startswith("["):
+        raise ValueError("expected a JSON array of documents")
+    buf = buf[1:]
+    eof = False
+    while True:
+        buf = buf.lstrip()
+        if buf.startswith(","):
+            buf = buf[1:].lstrip()
+        if buf.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buf) if buf else (None, 0)
+        except json.JSONDecodeError:
+            end = 0
+        if end and (end < len(buf) or eof):
+            yield item
+            buf = buf[end:]
+            continue
+        if eof:
+            raise ValueError("truncated JSON array")
+        # Read at least as much as is buffered, so one huge document costs
+        # O(n) re-parsing rather than O(n^2).
+        more = f.read(max(read_size, len(buf)))
+        eof = not more
+        buf += more
+
+
+def iter_documents(path: str) -> Iterator[Dict]:
+    """Streams documents from a .jsonl file (one object per line) or a JSON array."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Packs whole sentences into chunks of at most max_chars; only overlong sentences are cut."""
+    if len(text) <= max_chars:
+        return [text]
+    chunks: List[str] = []
+    current = ""
+    for sentence in SENTENCE_RE.split(text):
+        pieces = [sentence] if len(sentence) <= max_chars else textwrap.wrap(sentence, max_chars)
+        for piece in pieces:
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_documents(documents: Iterable[Dict], max_chars: int) -> Iterator[Dict]:
+    for doc in documents:
+        title = str(doc.get("title", ""))
+        parts = split_text(str(doc.get("text", "")), max_chars)
+        for i, part in enumerate(parts, 1):
+            yield {"title": title if len(parts) == 1 else f"{title} ({i}/{len(parts)})", "text": part}
+
+
+def build_store(documents: Iterable[Dict], path: str, max_chars: int = 1000, title_weight: int = 2) -> Dict:
+    """
+    Writes a store from a stream of documents. Only offsets and postings are
+    accumulated in memory; chunk text goes straight to disk. The file is
+    written beside the target and renamed into place, so readers never see
+    a partial store.
+    """
+    started = time.perf_counter()
+    offsets = array("Q")
+    lengths = array("I")
+    postings: Dict[str, Tuple[array, array]] = {}
+    digest = hashlib.sha1()
+    total_length = 0
+    tmp_path = path + ".tmp"
+
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        pos = len(MAGIC)
+        for doc_id, chunk in enumerate(chunk_documents(documents, max_chars)):
+            record = f"{chunk['title']}{SEPARATOR}{chunk['text']}".encode("utf-8")
+            offsets.append(pos)
+            f.write(record)
+            digest.update(record)
+            pos += len(record)
+
+            terms = document_terms(chunk, title_weight)
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array("I"), array("H"))
+                entry[0].append(doc_id)
+                entry[1].append(min(tf, 0xFFFF))
+            lengths.append(len(terms))
+            total_length += len(terms)
+        offsets.append(pos)
+
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            lengths.byteswap()
+        offsets_pos = pos
+        f.write(offsets.tobytes())
+        lengths_pos = offsets_pos + len(offsets) * 8
+        f.write(lengths.tobytes())
+        pos = lengths_pos + len(lengths) * 4
+
+        sorted_terms = sorted((term.encode("utf-8"), term) for term in postings)
+        term_offsets = array("Q")
+        term_postings = array("Q")
+        term_dfs = array("I")
+        for _, term in sorted_terms:
+            ids, tfs = postings.pop(term)
+            term_postings.append(pos)
+            term_dfs.append(len(ids))
+            if sys.byteorder != "little":
+                ids.byteswap()
+                tfs.byteswap()
+            f.write(ids.tobytes())
+            f.write(tfs.tobytes())
+            pos += len(ids) * 6
+
+        for encoded, _ in sorted_terms:
+            term_offsets.append(pos)
+            f.write(encoded)
+            pos += len(encoded)
+        term_offsets.append(pos)
+        tables = (term_offsets, term_postings, term_dfs)
+        table_positions = []
+        for table in tables:
+            table_positions.append(pos)
+            if sys.byteorder != "little":
+                table.byteswap()
+            f.write(table.tobytes())
+            pos += len(table) * table.itemsize
+
+        version = digest.hexdigest()[:12]
+        f.write(TRAILER.pack(
+            len(lengths), offsets_pos, lengths_pos, len(sorted_terms), *table_positions,
+            total_length, version.encode("ascii"), MAGIC
+        ))
+    os.replace(tmp_path, path)
+
+    return {
+        "chunks": len(lengths),
+        "terms": len(sorted_terms),
+        "bytes": os.path.getsize(path),
+        "version": version,
+        "build_s": round(time.perf_counter() - started, 3),
+    }
+
+
+# --- Reader ---
+class _TermTable:
+    """Sorted on-disk term list; get() is a binary search over the mapped bytes."""
+
+    def __init__(self, mm: mmap.mmap, offsets: memoryview, postings: memoryview, dfs: memoryview):
+        self._mm = mm
+        self._offsets = offsets
+        self._postings = postings
+        self._dfs = dfs
+
+    def __len__(self) -> int:
+        return len(self._dfs)
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._mm[self._offsets[i]:self._offsets[i + 1]]
+
+    def terms(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i].decode("utf-8")
+
+    def get(self, term: str) -> Optional[Tuple[int, int]]:
+        """(postings position, document frequency) for a term, or None."""
+        key = term.encode("utf-8")
+        i = bisect.bisect_left(self, key)
+        if i < len(self) and self[i] == key:
+            return self._postings[i], self._dfs[i]
+        return None
+
+    def release(self) -> None:
+        for view in (self._offsets, self._postings, self._dfs):
+            view.release()
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped chunk store with BM25 search. It exposes the
+    same search()/top_documents() interface as KnowledgeIndex.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        if sys.byteorder != "little":
+            raise RuntimeError("ChunkStore reads little-endian arrays in place and needs a little-endian host")
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (count, offsets_pos, lengths_pos, n_terms, term_offsets_pos, term_postings_pos, term_dfs_pos,
+         self.total_length, version, magic) = TRAILER.unpack_from(self._mm, len(self._mm) - TRAILER.size)
+        if magic != MAGIC or self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a knowledge store")
+        self.version = version.decode("ascii")
+        self._view = memoryview(self._mm)
+        self._offsets = self._view[offsets_pos:offsets_pos + (count + 1) * 8].cast("Q")
+        self._lengths = self._view[lengths_pos:lengths_pos + count * 4].cast("I")
+        self.postings = _TermTable(
+            self._mm,
+            self._view[term_offsets_pos:term_offsets_pos + (n_terms + 1) * 8].cast("Q"),
+            self._view[term_postings_pos:term_postings_pos + n_terms * 8].cast("Q"),
+            self._view[term_dfs_pos:term_dfs_pos + n_terms * 4].cast("I"),
+        )
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __getitem__(self, doc_id: int) -> Dict:
+        record = self._mm[self._offsets[doc_id]:self._offsets[doc_id + 1]].decode("utf-8")
+        title, _, text = record.partition(SEPARATOR)
+        return {"title": title, "text": text}
+
+    def __iter__(self) -> Iterator[Dict]:
+        for doc_id in range(len(self)):
+            yield self[doc_id]
+
+    def score(self, query: str) -> Dict[int, float]:
+        n_docs = len(self)
+        if not n_docs:
+            return {}
+        avg_length = self.total_length / n_docs or 1.0
+        lengths = self._lengths
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            pos, df = entry
+            ids = self._view[pos:pos + df * 4].cast("I")
+            tfs = self._view[pos + df * 4:pos + df * 6].cast("H")
+            idf = bm25_idf(n_docs, df)
+            for doc_id, tf in zip(ids, tfs):
+                norm = self.k1 * (1 - self.b + self.b * lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Tuple[Dict, float]]:
+        scores = self.score(query)
+        ranked = heapq.nlargest(
+            top_k,
+            ((doc_id, s) for doc_id, s in scores.items() if s >= min_score),
+            key=lambda item: item[1],
+        )
+        return [(self[doc_id], s) for doc_id, s in ranked]
+
+    def top_documents(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Dict]:
+        return [doc for doc, _ in self.search(query, top_k, min_score)]
+
+    def close(self) -> None:
+        self.postings.release()
+        self._offsets.release()
+        self._lengths.release()
+        self._view.release()
+        self._mm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="JSON array or .jsonl file of {title, text} documents")
+    parser.add_argument("output", help=f"store path (conventionally *{STORE_SUFFIX})")
+    parser.add_argument("--max-chars", type=int, default=1000, help="maximum characters per chunk")
+    args = parser.parse_args()
+    print(json.dumps(build_store(iter_documents(args.source), args.output, args.max_chars)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from sessions import Turn
+
+
+# Cohere does not expose its tokenizer offline; ~4 characters per token is
+# close enough for English prose to keep requests inside a budget.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+DOCUMENT_OVERHEAD_TOKENS = 8
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def turn_tokens(turn: Turn) -> int:
+    return estimate_tokens(turn[0]) + estimate_tokens(turn[1]) + 2 * MESSAGE_OVERHEAD_TOKENS
+
+
+def document_tokens(doc: Dict) -> int:
+    return estimate_tokens(doc.get("title", "")) + estimate_tokens(doc.get("text", "")) + DOCUMENT_OVERHEAD_TOKENS
+
+
+@dataclass
+class ContextPlan:
+    history: List[Turn] = field(default_factory=list)
+    documents: List[Dict] = field(default_factory=list)
+    budget: int = 0
+    used_tokens: int = 0
+    trimmed_tokens: int = 0
+    dropped_turns: int = 0
+    dropped_documents: int = 0
+
+    def report(self) -> Dict[str, int]:
+        return {
+            "budget": self.budget,
+            "used_tokens": self.used_tokens,
+            "trimmed_tokens": self.trimmed_tokens,
+            "dropped_turns": self.dropped_turns,
+            "dropped_documents": self.dropped_documents,
+        }
+
+
+def build_context(preamble: str, message: str, history: List[Turn], documents: List[Dict], budget: int) -> ContextPlan:
+    """
+    Fills a token budget in priority order: preamble and the new message
+    (always sent), then session turns from newest to oldest, then knowledge
+    documents in retrieval rank order. Whatever does not fit is dropped
+    whole and counted in the plan.
+    """
+    plan = ContextPlan(budget=budget)
+    used = estimate_tokens(preamble) + estimate_tokens(message) + MESSAGE_OVERHEAD_TOKENS
+
+    kept_turns = []
+    history_full = False
+    for turn in reversed(history):
+        cost = turn_tokens(turn)
+        if history_full or used + cost > budget:
+            # Keep turns contiguous: once one is dropped, all older ones go too.
+            history_full = True
+            plan.dropped_turns += 1
+            plan.trimmed_tokens += cost
+            continue
+        kept_turns.append(turn)
+        used += cost
+    kept_turns.reverse()
+
+    for doc in documents:
+        cost = document_tokens(doc)
+        if used + cost > budget:
+            plan.dropped_documents += 1
+            plan.trimmed_tokens += cost
+            continue
+        plan.documents.append(doc)
+        used += cost
+
+    plan.history = kept_turns
+    plan.used_tokens = used
+    return plan
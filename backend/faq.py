@@ -0,0 +1,147 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+# Words that do not change what a question asks. Unlike retrieval's
+# stopwords, question words, prepositions and negations are kept: "who is
+# Zordly" and "who is Zordly for" need different answers.
+FILLER_WORDS = frozenset(
+    "a an the is are am be do does did can could would should i me my you your "
+    "we our us it its this that please tell have has had s".split()
+)
+# Words sharing a prefix this long (and covering most of the shorter word)
+# count as the same word, so plurals and small typos still match.
+MIN_SHARED_PREFIX = 4
+
+
+def normalize_question(text: str) -> str:
+    """Lower-cases and reduces punctuation and whitespace runs to single spaces."""
+    return " ".join(_NON_WORD_RE.split(text.lower())).strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def content_words(normalized: str) -> Tuple[str, ...]:
+    return tuple(word for word in normalized.split() if word not in FILLER_WORDS)
+
+
+def same_word(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    shared = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        shared += 1
+    return shared >= MIN_SHARED_PREFIX and shared >= 0.75 * min(len(a), len(b))
+
+
+def covers(words: Tuple[str, ...], other: Tuple[str, ...]) -> bool:
+    """True when every word of `words` appears in `other`."""
+    return all(any(same_word(word, candidate) for candidate in other) for word in words)
+
+
+@dataclass
+class FAQEntry:
+    id: str
+    answer: str
+    questions: List[str] = field(default_factory=list)
+
+
+class FAQMatcher:
+    """
+    Fuzzy lookup of curated answers by character-trigram Dice similarity.
+
+    Every phrasing of every entry is indexed by its trigrams, so a lookup
+    only touches phrasings that share a trigram with the message. A
+    phrasing only counts if it and the message have the same content words
+    (see FILLER_WORDS): on short questions one changed word ("lack" for
+    "have") barely moves the trigram score but changes the answer. A match
+    is confident when the best entry reaches min_similarity and beats the
+    runner-up entry by min_margin; near-ties between two answers go to the
+    model instead.
+    """
+
+    def __init__(self, entries: List[FAQEntry], min_similarity: float = 0.8, min_margin: float = 0.1):
+        self.entries = entries
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._exact: Dict[str, int] = {}
+        self._sizes: List[int] = []
+        self._owners: List[int] = []
+        self._words: List[Tuple[str, ...]] = []
+        self._postings: Dict[str, List[int]] = {}
+        for entry_id, entry in enumerate(entries):
+            for question in entry.questions:
+                normalized = normalize_question(question)
+                self._exact.setdefault(normalized, entry_id)
+                question_id = len(self._sizes)
+                grams = trigrams(normalized)
+                self._sizes.append(len(grams))
+                self._owners.append(entry_id)
+                self._words.append(content_words(normalized))
+                for gram in grams:
+                    self._postings.setdefault(gram, []).append(question_id)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "FAQMatcher":
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        entries = [FAQEntry(str(item["id"]), item["answer"], list(item.get("questions", []))) for item in raw]
+        return cls(entries, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match(self, message: str) -> Optional[Tuple[FAQEntry, float]]:
+        normalized = normalize_question(message)
+        entry_id = self._exact.get(normalized)
+        if entry_id is not None:
+            self.hits += 1
+            return self.entries[entry_id], 1.0
+
+        grams = trigrams(normalized)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for question_id in self._postings.get(gram, ()):
+                shared[question_id] = shared.get(question_id, 0) + 1
+
+        words = content_words(normalized)
+        best: Dict[int, float] = {}
+        for question_id, count in shared.items():
+            score = 2 * count / (len(grams) + self._sizes[question_id])
+            if score < self.min_similarity:
+                continue
+            phrasing = self._words[question_id]
+            if not (covers(words, phrasing) and covers(phrasing, words)):
+                continue
+            owner = self._owners[question_id]
+            if score > best.get(owner, 0.0):
+                best[owner] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        if ranked and ranked[0][1] >= self.min_similarity:
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+            if ranked[0][1] - runner_up >= self.min_margin:
+                self.hits += 1
+                return self.entries[ranked[0][0]], ranked[0][1]
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "phrasings": len(self._sizes),
+            "min_similarity": self.min_similarity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from chunkstore import STORE_SUFFIX, ChunkStore
+from logs import log
+from retrieval import KnowledgeIndex, document_terms, stem_vocabulary, term_coverage
+
+
+def document_hash(doc: Dict) -> str:
+    return hashlib.sha1(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def read_knowledge(path: str) -> Tuple[List[Dict], str, int]:
+    """Returns (documents, content version, mtime_ns) for one read of the file."""
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, "rb") as f:
+        raw = f.read()
+    documents = json.loads(raw.decode("utf-8"))
+    if not isinstance(documents, list):
+        raise ValueError(f"{path} must contain a JSON list of documents")
+    for position, doc in enumerate(documents):
+        if not isinstance(doc, dict) or not all(isinstance(doc.get(field, ""), str) for field in ("title", "text")):
+            raise ValueError(f"{path}: document {position} must be an object with string title and text")
+    return documents, hashlib.sha1(raw).hexdigest()[:12], mtime
+
+
+class KnowledgeManager:
+    """
+    Owns Knowledge.json, its search index and the version caches key on.
+
+    The file is polled by mtime at most once per check_interval seconds and
+    only treated as changed when its content hash differs. Reading and
+    parsing run in a worker thread; the index is then patched on the event
+    loop without awaiting, so every request sees either the old or the new
+    knowledge, never a mix. Documents are matched by content hash, so an
+    edit re-indexes only the documents that were added, changed or removed.
+
+    A path ending in .zks is a prebuilt ChunkStore instead (see
+    chunkstore.py). It carries its own index, so a new store file is opened
+    and swapped in whole, and the old mapping is closed.
+
+    retrieval selects BM25 ("bm25"), the NumPy dense index ("dense", see
+    vectors.py) or both merged by reciprocal rank fusion ("hybrid"). The
+    dense matrix is rebuilt in the worker thread on every reload, or for a
+    store loaded from the .vec.npy built next to it.
+    """
+
+    RETRIEVAL_MODES = ("bm25", "dense", "hybrid")
+
+    def __init__(
+        self,
+        path: str,
+        check_interval: float = 5.0,
+        retrieval: str = "bm25",
+        dense_dim: int = 512,
+        dense_min_score: float = 0.1
+    ):
+        if retrieval not in self.RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval}' (expected one of {', '.join(self.RETRIEVAL_MODES)})")
+        self.path = path
+        self.check_interval = check_interval
+        self.retrieval = retrieval
+        self.dense_dim = dense_dim
+        self.dense_min_score = dense_min_score
+        self.is_store = path.endswith(STORE_SUFFIX)
+        self.index = KnowledgeIndex()
+        self.dense = None
+        self.vocabulary: Set[str] = set()
+        self.version = ""
+        self.generation = 0
+        self.last_reload: Dict[str, float] = {}
+        self.reload_errors = 0
+        self._doc_ids: Dict[str, List[int]] = {}
+        self._mtime = 0
+        self._checked_at = 0.0
+        self._reloading = False
+        self._listeners: List[Callable[[str], Optional[Awaitable[None]]]] = []
+        self._install(*self._load())
+
+    def on_change(self, listener: Callable[[str], Optional[Awaitable[None]]]) -> None:
+        """Registers a callback run with the new version after each reload; awaited if it returns an awaitable."""
+        self._listeners.append(listener)
+
+    def _apply(self, documents: List[Dict], version: str, mtime: int) -> Dict[str, float]:
+        started = time.perf_counter()
+        wanted: Dict[str, List[Dict]] = {}
+        for doc in documents:
+            wanted.setdefault(document_hash(doc), []).append(doc)
+
+        removed = added = 0
+        for digest in list(self._doc_ids):
+            doc_ids = self._doc_ids[digest]
+            keep = len(wanted.get(digest, ()))
+            while len(doc_ids) > keep:
+                self.index.remove(doc_ids.pop())
+                removed += 1
+            if not doc_ids:
+                del self._doc_ids[digest]
+        for digest, docs in wanted.items():
+            doc_ids = self._doc_ids.setdefault(digest, [])
+            for doc in docs[len(doc_ids):]:
+                doc_ids.append(self.index.add(doc))
+                added += 1
+
+        self._mtime = mtime
+        self.version = version
+        self.generation += 1
+        self.last_reload = {
+            "added": added,
+            "removed": removed,
+            "unchanged": len(documents) - added,
+            "index_ms": round((time.perf_counter() - started) * 1000, 3),
+            "at": time.time(),
+        }
+        return self.last_reload
+
+    def _swap_store(self, store: ChunkStore, mtime: int) -> Dict[str, float]:
+        previous = self.index
+        self.index = store
+        self._mtime = mtime
+        self.version = store.version
+        self.generation += 1
+        self.last_reload = {"chunks": len(store), "at": time.time()}
+        if isinstance(previous, ChunkStore):
+            # Searches never await, so nothing can still be reading it.
+            previous.close()
+        return self.last_reload
+
+    def _load_dense(self, documents: Sequence[Dict], version: str):
+        if self.retrieval == "bm25":
+            return None
+        # numpy is only imported when dense retrieval is switched on.
+        from vectors import DenseIndex, vectors_path
+
+        if self.is_store and os.path.exists(vectors_path(self.path)):
+            return DenseIndex.load(vectors_path(self.path), documents, version)
+        return DenseIndex.build(documents, self.dense_dim)
+
+    def _load(self) -> Tuple[Any, str, int, Any, Set[str]]:
+        """
+        The slow part of a (re)load, safe to run in a worker thread:
+        (payload, version, mtime, dense index, stemmed vocabulary).
+        """
+        if self.is_store:
+            mtime = os.stat(self.path).st_mtime_ns
+            store = ChunkStore(self.path)
+            if store.version == self.version:
+                return store, store.version, mtime, None, set()
+            try:
+                dense = self._load_dense(store, store.version)
+                return store, store.version, mtime, dense, stem_vocabulary(store.postings.terms())
+            except Exception:
+                store.close()
+                raise
+        documents, version, mtime = read_knowledge(self.path)
+        if version == self.version:
+            return documents, version, mtime, None, set()
+        vocabulary = stem_vocabulary(term for doc in documents for term in document_terms(doc))
+        return documents, version, mtime, self._load_dense(documents, version), vocabulary
+
+    def _install(self, payload, version: str, mtime: int, dense, vocabulary: Set[str]) -> None:
+        if self.is_store:
+            self._swap_store(payload, mtime)
+        else:
+            self._apply(payload, version, mtime)
+        self.dense = dense
+        self.vocabulary = vocabulary
+
+    def relevance(self, query: str) -> Optional[float]:
+        """How much of the query the knowledge base talks about at all; see retrieval.term_coverage."""
+        return term_coverage(query, self.vocabulary)
+
+    def top_documents(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Dict]:
+        """min_score applies to BM25 scores; dense matches must reach dense_min_score (cosine)."""
+        if self.dense is None:
+            return self.index.top_documents(query, top_k, min_score)
+        dense = self.dense.top_documents(query, top_k, self.dense_min_score)
+        if self.retrieval == "dense":
+            return dense
+        # Local import keeps numpy out of module import for BM25-only setups.
+        from vectors import fuse
+        return fuse([self.index.top_documents(query, top_k, min_score), dense], top_k)
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Reloads the file if it changed; returns True when a new version was applied."""
+        now = time.monotonic()
+        if self._reloading or (not force and now - self._checked_at < self.check_interval):
+            return False
+        self._checked_at = now
+
+        try:
+            if os.stat(self.path).st_mtime_ns == self._mtime and not force:
+                return False
+        except OSError as e:
+            self.reload_errors += 1
+            log.warning("knowledge_reload_skipped", path=self.path, error=str(e))
+            return False
+
+        # A single reload at a time; concurrent requests keep using the
+        # current index while the file is read.
+        self._reloading = True
+        try:
+            payload, version, mtime, dense, vocabulary = await asyncio.to_thread(self._load)
+        except Exception as e:
+            # Keep serving the current version; the next check tries again.
+            self.reload_errors += 1
+            log.warning("knowledge_reload_skipped", path=self.path, error=str(e) or repr(e))
+            return False
+        finally:
+            self._reloading = False
+
+        if version == self.version:
+            self._mtime = mtime
+            if self.is_store:
+                payload.close()
+            return False
+        self._install(payload, version, mtime, dense, vocabulary)
+        if self.is_store:
+            log.info("knowledge_reloaded", version=version, chunks=len(payload))
+        else:
+            stats = self.last_reload
+            log.info("knowledge_reloaded", version=version, added=stats["added"], removed=stats["removed"])
+        for listener in self._listeners:
+            try:
+                result = listener(version)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                # The new version is installed; one failing listener must not undo that.
+                log.exception("knowledge_listener_failed", version=version)
+        return True
+
+    async def watch(self) -> None:
+        """Background polling loop for long-running servers; serverless relies on per-request refresh()."""
+        while True:
+            await asyncio.sleep(max(self.check_interval, 0.5))
+            try:
+                await self.refresh()
+            except Exception:
+                log.exception("knowledge_watch_failed", path=self.path)
+
+    def stats(self) -> Dict:
+        return {
+            "version": self.version,
+            "generation": self.generation,
+            "documents": len(self.index),
+            "terms": len(self.index.postings),
+            "retrieval": self.retrieval,
+            "dense_vectors": len(self.dense) if self.dense is not None else 0,
+            "reload_errors": self.reload_errors,
+            "last_reload": self.last_reload,
+        }
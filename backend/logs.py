@@ -0,0 +1,231 @@
+"""
+Structured JSON logging that never blocks the event loop.
+
+Callers only build a dict and do a non-blocking put on a bounded queue; a
+daemon thread batches records, formats tracebacks, serializes them to one
+JSON object per line and writes to stdout or a file. When the writer falls
+behind (a slow disk or a stalled log collector), new records are dropped
+and counted instead of making request handlers wait.
+
+Fields bound with bind() (session_id, trace_id) are added to every record
+logged from the same request, including from tasks it starts. Noisy
+per-request events can be sampled: sample_rates={"relevance": 0.1} keeps
+one in ten. Warnings and errors are never sampled.
+
+    from logs import log
+    log.info("knowledge_reloaded", version=version)
+    log.exception("chat_failed")
+
+BatchWriter is the queue and writer thread on their own; TraceExporter
+(tracing.py) uses it too.
+"""
+import json
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+_bound: ContextVar[Dict[str, object]] = ContextVar("log_fields", default={})
+
+
+def bind(**fields) -> None:
+    """Adds fields to every record logged from the current context (request or task)."""
+    _bound.set({**_bound.get(), **fields})
+
+
+class BatchWriter:
+    """
+    A bounded queue drained by a daemon thread that hands write() batches of
+    up to batch_size records. put() never blocks: when the queue is full the
+    record is dropped and counted. A write that fails with OSError or
+    ValueError loses its batch; on_error is told why.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write: Callable[[List[Dict]], None],
+        on_error: Callable[[Exception, List[Dict]], None],
+        max_queue: int = 10_000,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+    ):
+        self.write = write
+        self.on_error = on_error
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, record: Dict) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def _drain(self, first: Dict) -> List[Dict]:
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = self._drain(first)
+            try:
+                self.write(batch)
+            except (OSError, ValueError) as e:
+                self.on_error(e, batch)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stops the writer after it has written everything already queued."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+
+class LogPipeline:
+    def __init__(
+        self,
+        path: str = "",
+        level: str = "info",
+        sample_rates: Optional[Dict[str, float]] = None,
+        max_queue: int = 10_000,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+    ):
+        self.path = path
+        self.level = LEVELS[level.lower()]
+        self.sample_rates = dict(sample_rates or {})
+        self.written = 0
+        self.sampled_out = 0
+        self.write_errors = 0
+        self.lost = 0
+        self._writer = BatchWriter("log-writer", self._write, self._failed, max_queue, batch_size, flush_interval)
+
+    @property
+    def dropped(self) -> int:
+        """Records lost to a full queue or a failed write."""
+        return self._writer.dropped + self.lost
+
+    # --- Producer side (any thread, usually the event loop) ---
+    def emit(self, level: str, event: str, exc: Optional[BaseException] = None, **fields) -> None:
+        severity = LEVELS[level]
+        if severity < self.level:
+            return
+        rate = self.sample_rates.get(event, 1.0)
+        if severity < LEVELS["warning"] and rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return
+        record = {"ts": time.time(), "level": level, "event": event, **_bound.get(), **fields}
+        if exc is not None:
+            # Formatting the traceback is left to the writer thread.
+            record["exc"] = exc
+        self._writer.put(record)
+
+    def debug(self, event: str, **fields) -> None:
+        self.emit("debug", event, **fields)
+
+    def info(self, event: str, **fields) -> None:
+        self.emit("info", event, **fields)
+
+    def warning(self, event: str, **fields) -> None:
+        self.emit("warning", event, **fields)
+
+    def error(self, event: str, **fields) -> None:
+        self.emit("error", event, **fields)
+
+    def exception(self, event: str, **fields) -> None:
+        """error() with the exception currently being handled attached."""
+        self.emit("error", event, exc=sys.exc_info()[1], **fields)
+
+    # --- Writer thread ---
+    @staticmethod
+    def _format(record: Dict) -> str:
+        exc = record.pop("exc", None)
+        if exc is not None:
+            record["error"] = repr(exc)
+            record["traceback"] = "".join(traceback.format_exception(exc))
+        record["ts"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record["ts"])) + f".{int(record['ts'] % 1 * 1000):03d}Z"
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+    def _write(self, batch: List[Dict]) -> None:
+        lines = "".join(self._format(record) for record in batch)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        else:
+            sys.stdout.write(lines)
+            sys.stdout.flush()
+        self.written += len(batch)
+
+    def _failed(self, error: Exception, batch: List[Dict]) -> None:
+        self.write_errors += 1
+        self.lost += len(batch)
+        sys.stderr.write(f"Log write failed: {error}\n")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._writer.queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "write_errors": self.write_errors,
+        }
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stops the writer after it has written everything already queued."""
+        self._writer.close(timeout)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """"relevance=0.1,context_trimmed=0.5" -> {"relevance": 0.1, "context_trimmed": 0.5}"""
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            event, rate = item.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class _Proxy:
+    """Module-level logger that configure() can swap without re-importing callers."""
+
+    def __init__(self):
+        self.pipeline: Optional[LogPipeline] = None
+
+    def __getattr__(self, name):
+        if self.pipeline is None:
+            self.pipeline = LogPipeline()
+        return getattr(self.pipeline, name)
+
+
+log = _Proxy()
+
+
+def configure(**kwargs) -> LogPipeline:
+    """Replaces the module logger, flushing the old one first."""
+    if log.pipeline is not None:
+        log.pipeline.close()
+    log.pipeline = LogPipeline(**kwargs)
+    return log.pipeline
@@ -1,49 +1,322 @@
-from fastapi import FastAPI, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Any, Optional, Dict, List, AsyncIterator, Set, Tuple
 from datetime import datetime, timezone
 from dotenv import dotenv_values
-import cohere
+from contextlib import suppress
 import asyncio
 import uuid
 import os
-import traceback
 import json
+import math
+
+from admission import AdmissionController, Overloaded
+from archive import TranscriptArchive
+from cache import ResponseCache, normalize_message
+from context import CHARS_PER_TOKEN, build_context
+from faq import FAQMatcher
+from knowledge import KnowledgeManager
+from logs import bind, configure as configure_logging, log, parse_sample_rates
+from metrics import CONTENT_TYPE, TOKEN_BUCKETS, MetricsMiddleware, Registry, expose
+from providers import REFUSAL, LLMProvider, LLMRequest, create_provider
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, retry_after_of, status_of
+from sessions import SessionStore, Turn
+from shared import SharedResponseCache, SharedSessionStore
+from storage import create_state
+from summarize import Summarizer, summary_section
+from singleflight import SingleFlight
+from startup import AsyncOnce, StartupProfile
+from tracing import TraceExporter, TracingMiddleware, annotate, current_trace, mark, span
 
 
 env_vars = dotenv_values(".env")
-api_key = env_vars.get("COHERE_API_KEY") or os.getenv("COHERE_API_KEY")
 
-if not api_key:
-    raise RuntimeError("COHERE_API_KEY not found in environment")
 
-KNOWLEDGE = ''
+def get_setting(name: str, default):
+    return env_vars.get(name) or os.getenv(name) or default
+
+
+LLM_PROVIDER = str(get_setting("LLM_PROVIDER", "cohere")).lower()
+
+RETRIEVAL_TOP_K = int(get_setting("RETRIEVAL_TOP_K", 3))
+RETRIEVAL_MIN_SCORE = float(get_setting("RETRIEVAL_MIN_SCORE", 0.0))
+RETRIEVAL_MODE = str(get_setting("RETRIEVAL_MODE", "bm25")).lower()
+DENSE_DIM = int(get_setting("DENSE_DIM", 512))
+DENSE_MIN_SCORE = float(get_setting("DENSE_MIN_SCORE", 0.1))
+
+RESPONSE_CACHE_SIZE = int(get_setting("RESPONSE_CACHE_SIZE", 1024))
+RESPONSE_CACHE_TTL = float(get_setting("RESPONSE_CACHE_TTL", 300))
+KNOWLEDGE_CHECK_INTERVAL = float(get_setting("KNOWLEDGE_CHECK_INTERVAL", 5))
+SESSION_MAX_TURNS = int(get_setting("SESSION_MAX_TURNS", 10))
+SESSION_IDLE_TTL = float(get_setting("SESSION_IDLE_TTL", 1800))
+SESSION_MAX_COUNT = int(get_setting("SESSION_MAX_COUNT", 100_000))
+SESSION_MAX_BYTES = int(get_setting("SESSION_MAX_BYTES", 256 * 1024 * 1024))
+CONTEXT_TOKEN_BUDGET = int(get_setting("CONTEXT_TOKEN_BUDGET", 4000))
+UPSTREAM_MAX_ATTEMPTS = int(get_setting("UPSTREAM_MAX_ATTEMPTS", 4))
+UPSTREAM_DEADLINE = float(get_setting("UPSTREAM_DEADLINE", 10))
+# Longest gap between chunks once a stream has started.
+UPSTREAM_IDLE_TIMEOUT = float(get_setting("UPSTREAM_IDLE_TIMEOUT", 30))
+RETRY_BASE_DELAY = float(get_setting("RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(get_setting("RETRY_MAX_DELAY", 4))
+BREAKER_FAILURE_THRESHOLD = int(get_setting("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RECOVERY_TIME = float(get_setting("BREAKER_RECOVERY_TIME", 30))
+UPSTREAM_MAX_CONCURRENCY = int(get_setting("UPSTREAM_MAX_CONCURRENCY", 32))
+UPSTREAM_MAX_QUEUE = int(get_setting("UPSTREAM_MAX_QUEUE", 64))
+UPSTREAM_MAX_QUEUE_WAIT = float(get_setting("UPSTREAM_MAX_QUEUE_WAIT", 2))
+# Set by serve.py. With several workers the response cache and sessions live
+# in the SHARED_STATE_PATH SQLite database, and the upstream concurrency and
+# queue limits above are split evenly so they still hold for the service.
+WORKERS = max(1, int(get_setting("WORKERS", 1)))
+SHARED_STATE_PATH = str(get_setting("SHARED_STATE_PATH", ""))
+# "memory" keeps sessions and cached answers in this process (or the
+# SHARED_STATE_PATH database); "redis" keeps them on a Redis-protocol server
+# at REDIS_URL so every replica shares them (see storage.py).
+STATE_BACKEND = str(get_setting("STATE_BACKEND", "memory")).lower()
+TRACE_FILE = str(get_setting("TRACE_FILE", ""))
+# First-turn messages whose knowledge coverage is below this get the refusal
+# without an upstream call; 0 turns the gate off.
+RELEVANCE_THRESHOLD = float(get_setting("RELEVANCE_THRESHOLD", 0.25))
+BATCH_MAX_ITEMS = int(get_setting("BATCH_MAX_ITEMS", 1000))
+BATCH_MAX_PARALLELISM = int(get_setting("BATCH_MAX_PARALLELISM", 8))
+
+# Knowledge.json, or a prebuilt *.zks chunk store for large corpora (see chunkstore.py).
+KNOWLEDGE_PATH = str(get_setting("KNOWLEDGE_PATH", "Knowledge.json"))
+# JSON log lines go to LOG_FILE (stdout when empty). LOG_SAMPLE keeps a
+# fraction of high-volume events, e.g. "relevance=0.1,context_trimmed=0.5".
+LOG_FILE = str(get_setting("LOG_FILE", ""))
+LOG_LEVEL = str(get_setting("LOG_LEVEL", "info")).lower()
+LOG_SAMPLE = str(get_setting("LOG_SAMPLE", ""))
+LOG_MAX_QUEUE = int(get_setting("LOG_MAX_QUEUE", 10_000))
+# Every answered turn is appended to compressed JSONL segments here (see
+# archive.py); empty disables the archive. Batches are written every
+# ARCHIVE_FLUSH_INTERVAL seconds or once ARCHIVE_FLUSH_RECORDS are buffered.
+ARCHIVE_DIR = str(get_setting("ARCHIVE_DIR", "transcripts"))
+ARCHIVE_FLUSH_INTERVAL = float(get_setting("ARCHIVE_FLUSH_INTERVAL", 5))
+ARCHIVE_FLUSH_RECORDS = int(get_setting("ARCHIVE_FLUSH_RECORDS", 1000))
+ARCHIVE_MAX_FILE_MB = float(get_setting("ARCHIVE_MAX_FILE_MB", 64))
+ARCHIVE_MAX_FILES = int(get_setting("ARCHIVE_MAX_FILES", 0))
+# Curated answers served without an upstream call when a first-turn message
+# is at least this similar (trigram Dice, 0-1) to one of their phrasings.
+FAQ_PATH = str(get_setting("FAQ_PATH", "faq.json"))
+FAQ_MIN_SIMILARITY = float(get_setting("FAQ_MIN_SIMILARITY", 0.8))
+# /ws/chat: app-level ping after this much silence, close after no chat
+# message for WS_IDLE_TIMEOUT, refuse sockets beyond WS_MAX_CONNECTIONS.
+WS_HEARTBEAT_INTERVAL = float(get_setting("WS_HEARTBEAT_INTERVAL", 20))
+WS_IDLE_TIMEOUT = float(get_setting("WS_IDLE_TIMEOUT", 300))
+WS_MAX_CONNECTIONS = int(get_setting("WS_MAX_CONNECTIONS", 10_000))
+# Once a session's turns pass SUMMARY_TRIGGER_TOKENS (or nearly fill
+# SESSION_MAX_TURNS), all but the SUMMARY_KEEP_TURNS newest are folded into
+# a summary of at most SUMMARY_MAX_TOKENS in the background (see
+# summarize.py); 0 turns summarization off.
+SUMMARY_TRIGGER_TOKENS = int(get_setting("SUMMARY_TRIGGER_TOKENS", 1000))
+SUMMARY_KEEP_TURNS = int(get_setting("SUMMARY_KEEP_TURNS", 4))
+SUMMARY_MAX_TOKENS = int(get_setting("SUMMARY_MAX_TOKENS", 250))
+
+
+LOGS = configure_logging(
+    path=LOG_FILE, level=LOG_LEVEL, sample_rates=parse_sample_rates(LOG_SAMPLE), max_queue=LOG_MAX_QUEUE
+)
+if SHARED_STATE_PATH:
+    RESPONSE_CACHE = SharedResponseCache(SHARED_STATE_PATH, max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+    SESSIONS = SharedSessionStore(
+        SHARED_STATE_PATH,
+        max_turns=SESSION_MAX_TURNS,
+        idle_ttl=SESSION_IDLE_TTL,
+        max_sessions=SESSION_MAX_COUNT,
+        max_bytes=SESSION_MAX_BYTES,
+    )
+else:
+    RESPONSE_CACHE = ResponseCache(max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+    SESSIONS = SessionStore(
+        max_turns=SESSION_MAX_TURNS,
+        idle_ttl=SESSION_IDLE_TTL,
+        max_sessions=SESSION_MAX_COUNT,
+        max_bytes=SESSION_MAX_BYTES,
+    )
+STATE = create_state(STATE_BACKEND, get_setting, sessions=SESSIONS, cache=RESPONSE_CACHE)
+UPSTREAM_FLIGHTS = SingleFlight()
+RETRY_POLICY = RetryPolicy(
+    max_attempts=UPSTREAM_MAX_ATTEMPTS,
+    base_delay=RETRY_BASE_DELAY,
+    max_delay=RETRY_MAX_DELAY,
+    deadline=UPSTREAM_DEADLINE,
+    idle_timeout=UPSTREAM_IDLE_TIMEOUT,
+)
+UPSTREAM_BREAKER = CircuitBreaker(
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    recovery_time=BREAKER_RECOVERY_TIME,
+)
+ADMISSION = AdmissionController(
+    max_concurrent=-(-UPSTREAM_MAX_CONCURRENCY // WORKERS),
+    max_queue=-(-UPSTREAM_MAX_QUEUE // WORKERS),
+    max_wait=UPSTREAM_MAX_QUEUE_WAIT,
+)
+WEBSOCKETS: Set[WebSocket] = set()
+ARCHIVE = TranscriptArchive(
+    ARCHIVE_DIR,
+    flush_interval=ARCHIVE_FLUSH_INTERVAL,
+    max_batch=ARCHIVE_FLUSH_RECORDS,
+    max_file_bytes=int(ARCHIVE_MAX_FILE_MB * 1024 * 1024),
+    max_files=ARCHIVE_MAX_FILES,
+) if ARCHIVE_DIR else None
+CONTEXT_STATS = {"requests": 0, "trimmed_requests": 0, "trimmed_tokens": 0, "dropped_turns": 0, "dropped_documents": 0}
+
+
+# --- Lazy initialization ---
+# Parsing Knowledge.json and building the provider client (which imports the
+# SDK) are deferred to the first request or server startup, so importing this
+# module on a cold start only pays for FastAPI itself.
+STARTUP = StartupProfile()
+KNOWLEDGE: Optional[KnowledgeManager] = None
+LLM: Optional[LLMProvider] = None
+FAQ: Optional[FAQMatcher] = None
+
+
+async def _load_knowledge() -> KnowledgeManager:
+    with STARTUP.phase("knowledge"):
+        knowledge = await asyncio.to_thread(
+            KnowledgeManager, KNOWLEDGE_PATH, KNOWLEDGE_CHECK_INTERVAL, RETRIEVAL_MODE, DENSE_DIM, DENSE_MIN_SCORE
+        )
+    # A new knowledge version changes the cache key; clearing also frees the
+    # entries that can no longer be hit.
+    knowledge.on_change(lambda version: STATE.clear_responses())
+    return knowledge
+
+
+async def _load_provider() -> LLMProvider:
+    with STARTUP.phase("provider"):
+        return await asyncio.to_thread(create_provider, LLM_PROVIDER, get_setting)
+
 
+async def _load_faq() -> Optional[FAQMatcher]:
+    if not FAQ_PATH or not os.path.exists(FAQ_PATH):
+        log.warning("faq_disabled", path=FAQ_PATH)
+        return None
+    with STARTUP.phase("faq"):
+        return await asyncio.to_thread(FAQMatcher.from_file, FAQ_PATH, min_similarity=FAQ_MIN_SIMILARITY)
 
-with open("Knowledge.json", "r", encoding="utf-8") as f:
-    KNOWLEDGE = json.load(f)
 
+async def initialize() -> None:
+    global KNOWLEDGE, LLM, FAQ
+    started = time.perf_counter()
+    knowledge, llm, faq = await asyncio.gather(_load_knowledge(), _load_provider(), _load_faq())
+    KNOWLEDGE, LLM, FAQ = knowledge, llm, faq
+    STARTUP.record("init", time.perf_counter() - started)
+    log.info("startup", phases_ms=STARTUP.stats(), faq_entries=len(faq) if faq else 0)
 
-co = cohere.AsyncClient(api_key)
 
+ensure_ready = AsyncOnce(initialize)
+
+
+async def require_ready() -> None:
+    try:
+        await ensure_ready()
+    except Exception as e:
+        log.exception("init_failed")
+        raise HTTPException(status_code=503, detail=f"Service not initialized: {e}")
 
-MODEL_NAME = "command-r-plus"  
 
 app = FastAPI(
     title="AI Chatbot API",
-    description="A FastAPI server to interact with Cohere API using streamed responses",
+    description="A FastAPI server to interact with an LLM provider (Cohere by default) using streamed responses",
     version="1.0.0"
 )
 
+# Also checked by /ws/chat, since CORSMiddleware does not cover WebSockets.
+ALLOWED_ORIGINS = ["https://devin-bot.vercel.app", "http://localhost:5173"]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["https://devin-bot.vercel.app", "http://localhost:5173"],
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+TRACE_EXPORTER = TraceExporter(TRACE_FILE) if TRACE_FILE else None
+app.add_middleware(TracingMiddleware, exporter=TRACE_EXPORTER)
+
+# --- Metrics ---
+METRICS = Registry()
+app.add_middleware(MetricsMiddleware, registry=METRICS)
+
+LLM_TTFT = METRICS.histogram(
+    "llm_time_to_first_token_seconds", "Time from upstream call start to first chunk.", ("provider",)
+).labels(LLM_PROVIDER)
+LLM_GENERATION = METRICS.histogram(
+    "llm_generation_seconds", "Total time of successful upstream generations.", ("provider",)
+).labels(LLM_PROVIDER)
+LLM_PROMPT_TOKENS = METRICS.histogram(
+    "llm_prompt_tokens", "Estimated prompt tokens sent upstream.", ("provider",), TOKEN_BUCKETS
+).labels(LLM_PROVIDER)
+LLM_OUTPUT_TOKENS = METRICS.histogram(
+    "llm_output_tokens", "Estimated tokens generated per upstream call.", ("provider",), TOKEN_BUCKETS
+).labels(LLM_PROVIDER)
+LLM_IN_FLIGHT = METRICS.gauge("llm_requests_in_flight", "Upstream calls currently streaming.")
+LLM_RETRIES = METRICS.counter("llm_retries_total", "Upstream attempts that were retried, by reason.", ("reason",))
+LLM_FAILURES = METRICS.counter("llm_failures_total", "Upstream calls that failed for good, by reason.", ("reason",))
+CHAT_RESPONSES = METRICS.counter("chat_responses_total", "Chat answers served, by source.", ("source",))
+RELEVANCE_SCORES = METRICS.histogram(
+    "relevance_score", "Knowledge coverage of first-turn messages (see RELEVANCE_THRESHOLD).",
+    buckets=(0.1, 0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.75, 0.9, 1.0)
+)
+
+expose(METRICS, "response_cache_hits_total", "Response cache hits.", lambda: STATE.hits, "counter")
+expose(METRICS, "response_cache_misses_total", "Response cache misses.", lambda: STATE.misses, "counter")
+# Read by /metrics through STATE.sizes() (in a worker thread for the shared
+# SQLite stores) just before rendering. Empty with the redis backend, whose
+# sizes live on the server.
+STATE_SIZES: Dict[str, int] = {}
+expose(METRICS, "response_cache_entries", "Entries in the response cache.",
+       lambda: STATE_SIZES.get("cache_entries"))
+expose(METRICS, "upstream_coalesced_total", "Requests that joined an in-flight upstream call.", lambda: UPSTREAM_FLIGHTS.coalesced, "counter")
+expose(METRICS, "admission_queue_depth", "Requests waiting for an upstream slot.", lambda: ADMISSION.waiting)
+expose(METRICS, "summary_folds_total", "Times older session turns were folded into a summary.",
+       lambda: SUMMARIZER.folds if SUMMARIZER is not None else None, "counter")
+# Net of each summary's own cost, so it can fall; hence a gauge.
+expose(METRICS, "summary_tokens_saved", "Estimated prompt tokens saved by sending summaries instead of turns.",
+       lambda: SUMMARIZER.tokens_saved if SUMMARIZER is not None else None)
+expose(METRICS, "admission_rejected_total", "Requests shed by admission control.",
+       lambda: ADMISSION.rejected_queue_full + ADMISSION.rejected_timeout, "counter")
+expose(METRICS, "circuit_breaker_open", "1 while the upstream circuit breaker is not closed.",
+       lambda: 0 if UPSTREAM_BREAKER.state == CircuitBreaker.CLOSED else 1)
+expose(METRICS, "sessions_live", "Live chat sessions.", lambda: STATE_SIZES.get("sessions"))
+expose(METRICS, "sessions_bytes", "Estimated memory held by chat sessions.",
+       lambda: STATE_SIZES.get("session_bytes"))
+expose(METRICS, "websocket_connections", "Open /ws/chat connections.", lambda: len(WEBSOCKETS))
+expose(METRICS, "log_records_dropped_total", "Log records dropped because the log queue was full.",
+       lambda: LOGS.dropped, "counter")
+expose(METRICS, "archive_turns_written_total", "Chat turns written to the transcript archive.",
+       lambda: ARCHIVE.written if ARCHIVE else None, "counter")
+expose(METRICS, "archive_turns_dropped_total", "Chat turns the transcript archive could not keep.",
+       lambda: ARCHIVE.dropped if ARCHIVE else None, "counter")
+expose(METRICS, "knowledge_documents", "Documents in the knowledge index.",
+       lambda: len(KNOWLEDGE.index) if KNOWLEDGE else None)
+expose(METRICS, "knowledge_reloads_total", "Knowledge.json versions loaded since start.",
+       lambda: KNOWLEDGE.generation if KNOWLEDGE else None, kind="counter")
+METRICS.callback(
+    "startup_phase_seconds", "Duration of each startup phase.",
+    lambda: {(name,): ms / 1000 for name, ms in STARTUP.phases.items()}, ("phase",)
+)
+
+
+def bind_request(**fields) -> None:
+    """Correlates log records from this request with its trace (and session, once known)."""
+    trace = current_trace()
+    if trace is not None:
+        fields["trace_id"] = trace.trace_id
+    bind(**fields)
+
+
+def failure_reason(exc: BaseException) -> str:
+    status = status_of(exc)
+    return str(status) if status is not None else type(exc).__name__
+
 
 # --- Pydantic Models ---
 class ChatMessage(BaseModel):
@@ -54,76 +327,803 @@ class ChatResponse(BaseModel):
     response: str
     session_id: str
     timestamp: str
+    cached: bool = False
+    source: str = "upstream"
 
 class ResetResponse(BaseModel):
     message: str
 
-async def call_cohere_stream_with_retry(prompt: str, max_retries: int = 5, initial_delay: float = 1.0) -> str:
-    delay = initial_delay
-    for attempt in range(max_retries):
-        try:
-            stream = co.chat_stream(
-                message=prompt,
-                model=MODEL_NAME,
-                documents=KNOWLEDGE,
-                temperature=0.3,
-                preamble=(
-                    "You are a helpful assistant that only answers questions "
-                    "using the provided business knowledge. "
-                    "If the question is unrelated to the documents, respond politely with: "
-                    "'I'm sorry, I can only answer questions related to Zordly or its services.'"
-                ),
-                prompt_truncation="AUTO"
-            )
+PREAMBLE = (
+    "You are a helpful assistant that only answers questions "
+    "using the provided business knowledge. "
+    "If the question is unrelated to the documents, respond politely with: "
+    f"'{REFUSAL}'"
+)
 
-            ai_response = ""
-            async for event in stream:
-                if event.event_type == "text-generation":
-                    ai_response += event.text
 
-            return ai_response.strip()
+def record_context(plan) -> None:
+    CONTEXT_STATS["requests"] += 1
+    if not plan.trimmed_tokens:
+        return
+    CONTEXT_STATS["trimmed_requests"] += 1
+    CONTEXT_STATS["trimmed_tokens"] += plan.trimmed_tokens
+    CONTEXT_STATS["dropped_turns"] += plan.dropped_turns
+    CONTEXT_STATS["dropped_documents"] += plan.dropped_documents
+    log.info("context_trimmed", **plan.report())
+
+
+async def _next_chunk(chunks):
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def upstream_error(status_code: int, detail: str, retry_after: Optional[float] = None) -> HTTPException:
+    headers = {"Retry-After": str(max(1, math.ceil(retry_after)))} if retry_after is not None else None
+    return HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+
+async def stream_llm_with_retry(
+    prompt: str,
+    history: Optional[List[Turn]] = None,
+    summary: Optional[Dict[str, Any]] = None,
+    policy: Optional[RetryPolicy] = None
+) -> AsyncIterator[str]:
+    """
+    Yields text chunks from the configured LLM provider as soon as they arrive.
+
+    Only the top RETRIEVAL_TOP_K knowledge documents scoring at least
+    RETRIEVAL_MIN_SCORE are sent, so the prompt no longer grows with the
+    size of Knowledge.json. A session's summary of its older turns goes in
+    the preamble; recent history and documents are then fitted into
+    CONTEXT_TOKEN_BUDGET locally.
+
+    Retries follow RETRY_POLICY: jittered backoff, upstream Retry-After
+    hints, retryable errors only, and a deadline on the wait for the first
+    token. A failed attempt is only retried while nothing has been yielded
+    yet; once the caller has seen part of an answer, restarting would
+    duplicate it. UPSTREAM_BREAKER short-circuits calls while upstream is down.
+    """
+    policy = policy or RETRY_POLICY
+    preamble = PREAMBLE + summary_section(summary)
+    with span("context"):
+        documents = KNOWLEDGE.top_documents(prompt, RETRIEVAL_TOP_K, RETRIEVAL_MIN_SCORE)
+        plan = build_context(preamble, prompt, history or [], documents, CONTEXT_TOKEN_BUDGET)
+    record_context(plan)
+    request = LLMRequest(
+        message=prompt,
+        preamble=preamble,
+        history=plan.history,
+        documents=plan.documents,
+        temperature=0.3
+    )
+
+    LLM_PROMPT_TOKENS.observe(plan.used_tokens)
+
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            with span("queue"):
+                await ADMISSION.acquire()
+        except Overloaded as e:
+            LLM_FAILURES.labels("overloaded").inc()
+            raise upstream_error(503, f"Server overloaded: {e}", e.retry_after)
+        try:
+            UPSTREAM_BREAKER.before_call()
+        except CircuitOpenError as e:
+            ADMISSION.release()
+            LLM_FAILURES.labels("circuit_open").inc()
+            raise upstream_error(503, f"{LLM.name} API unavailable: {e}", e.retry_after)
+
+        emitted = False
+        verdict = False
+        chunks = None
+        output_chars = 0
+        attempt_started = time.perf_counter()
+        trace = current_trace()
+        LLM_IN_FLIGHT.inc()
+        try:
+            chunks = LLM.stream(request).__aiter__()
+            while True:
+                if emitted:
+                    try:
+                        chunk = await asyncio.wait_for(_next_chunk(chunks), policy.idle_timeout)
+                    except asyncio.TimeoutError:
+                        raise asyncio.TimeoutError(f"no chunk for {policy.idle_timeout:g}s")
+                else:
+                    remaining = policy.deadline - (time.monotonic() - started)
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError("deadline exceeded waiting for first token")
+                    chunk = await asyncio.wait_for(_next_chunk(chunks), remaining)
+                if chunk is None:
+                    break
+                if chunk:
+                    if not emitted:
+                        first_chunk_at = time.perf_counter()
+                        LLM_TTFT.observe(first_chunk_at - attempt_started)
+                        if trace is not None:
+                            trace.add("upstream_ttft", attempt_started, first_chunk_at)
+                        emitted = True
+                    output_chars += len(chunk)
+                    yield chunk
+            UPSTREAM_BREAKER.record_success()
+            verdict = True
+            LLM_GENERATION.observe(time.perf_counter() - attempt_started)
+            LLM_OUTPUT_TOKENS.observe(-(-output_chars // CHARS_PER_TOKEN))
+            return
 
         except Exception as e:
-            print(f"Attempt {attempt+1}/{max_retries} failed: {e}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(delay)
-                delay *= 2
-            else:
+            UPSTREAM_BREAKER.record_failure(e)
+            verdict = True
+            log.warning(
+                "upstream_attempt_failed",
+                attempt=attempt + 1, max_attempts=policy.max_attempts, reason=failure_reason(e), error=repr(e)
+            )
+            failure = e
+        finally:
+            if not verdict:
+                # Cancelled, or the consumer closed this generator mid-stream
+                # (client disconnect): neither says anything about upstream
+                # health, but a half-open probe must not stay in flight.
+                UPSTREAM_BREAKER.release()
+            if chunks is not None:
+                # Stops a stalled or abandoned provider stream before retrying.
+                with suppress(Exception):
+                    await chunks.aclose()
+            # Backoff sleeps below happen without holding an upstream slot.
+            ADMISSION.release()
+            LLM_IN_FLIGHT.dec()
+            if trace is not None:
+                trace.add("upstream", attempt_started, time.perf_counter())
+
+        if emitted:
+            LLM_FAILURES.labels("interrupted").inc()
+            raise HTTPException(
+                status_code=502,
+                detail=f"{LLM.name} stream interrupted: {failure}"
+            )
+        remaining = policy.deadline - (time.monotonic() - started)
+        delay = policy.next_delay(attempt, failure, remaining)
+        if delay is None:
+            LLM_FAILURES.labels(failure_reason(failure)).inc()
+            if status_of(failure) == 429:
+                raise upstream_error(503, f"{LLM.name} API rate limited: {failure}", retry_after_of(failure) or policy.max_delay)
+            if isinstance(failure, asyncio.TimeoutError):
                 raise HTTPException(
-                    status_code=500,
-                    detail=f"Cohere API call failed after {max_retries} retries: {e}"
+                    status_code=504,
+                    detail=f"{LLM.name} API did not respond within {policy.deadline:g}s"
                 )
+            raise HTTPException(
+                status_code=500,
+                detail=f"{LLM.name} API call failed after {attempt+1} attempts: {failure}"
+            )
+        LLM_RETRIES.labels(failure_reason(failure)).inc()
+        with span("retry_wait"):
+            await asyncio.sleep(delay)
+        attempt += 1
+
+
+def response_cache_key(message: str):
+    return (normalize_message(message), KNOWLEDGE.version)
+
+
+def coalesced_stream(prompt: str) -> AsyncIterator[str]:
+    """Joins an identical in-flight upstream call instead of starting a new one."""
+    return UPSTREAM_FLIGHTS.stream(
+        response_cache_key(prompt),
+        lambda: stream_llm_with_retry(prompt)
+    )
+
+
+def answer_stream(
+    prompt: str, history: Optional[List[Turn]] = None, summary: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    """
+    First turns are identical across sessions and go through coalescing;
+    follow-up turns depend on their own history and always call upstream.
+    """
+    if history:
+        return stream_llm_with_retry(prompt, history=history, summary=summary)
+    return coalesced_stream(prompt)
+
+
+async def call_llm_with_retry(
+    prompt: str, history: Optional[List[Turn]] = None, summary: Optional[Dict[str, Any]] = None
+) -> str:
+    parts = []
+    async for chunk in answer_stream(prompt, history, summary):
+        parts.append(chunk)
+    return "".join(parts).strip()
+
+
+async def complete_summary(request: LLMRequest) -> Optional[str]:
+    """
+    One upstream call for the summarizer. Summaries are optional work, so
+    they never wait for an upstream slot or probe a recovering upstream;
+    they are skipped (None) and retried after the session's next turn.
+    """
+    if (
+        UPSTREAM_BREAKER.state != CircuitBreaker.CLOSED
+        or ADMISSION.waiting
+        or ADMISSION.active >= ADMISSION.max_concurrent
+    ):
+        return None
+    await ADMISSION.acquire()
+    LLM_IN_FLIGHT.inc()
+    try:
+        text = await asyncio.wait_for(LLM.complete(request), UPSTREAM_DEADLINE)
+    except Exception as e:
+        UPSTREAM_BREAKER.record_failure(e)
+        raise
+    finally:
+        ADMISSION.release()
+        LLM_IN_FLIGHT.dec()
+    UPSTREAM_BREAKER.record_success()
+    return text
+
+
+SUMMARIZER = Summarizer(
+    STATE,
+    complete_summary,
+    trigger_tokens=SUMMARY_TRIGGER_TOKENS,
+    keep_turns=SUMMARY_KEEP_TURNS,
+    max_turns=SESSION_MAX_TURNS,
+    max_tokens=SUMMARY_MAX_TOKENS,
+) if SUMMARY_TRIGGER_TOKENS > 0 else None
+
+
+def faq_answer(message: str, history: Optional[List[Turn]]) -> Optional[str]:
+    """
+    The curated answer for a first-turn message that confidently matches
+    an FAQ phrasing, or None. Follow-ups go upstream with their history.
+    """
+    if history or FAQ is None:
+        return None
+    with span("faq"):
+        match = FAQ.match(message)
+    if match is None:
+        return None
+    entry, similarity = match
+    annotate(faq=entry.id, faq_similarity=round(similarity, 3))
+    return entry.answer
+
+
+def off_topic(message: str, history: Optional[List[Turn]]) -> bool:
+    """
+    Local relevance gate: True when a first-turn message shares too little
+    vocabulary with the knowledge base to be answerable, so the canned
+    refusal can be served without an upstream round trip. Follow-ups are
+    never gated; "and the second one?" only makes sense with its history.
+    Scores are logged and exported so the threshold can be tuned.
+    """
+    if history or RELEVANCE_THRESHOLD <= 0:
+        return False
+    score = KNOWLEDGE.relevance(message)
+    if score is None:
+        return False
+    refused = score < RELEVANCE_THRESHOLD
+    RELEVANCE_SCORES.observe(score)
+    annotate(relevance=round(score, 3))
+    log.info("relevance", score=round(score, 3), refused=refused, threshold=RELEVANCE_THRESHOLD, message=message[:80])
+    return refused
+
+
+async def lookup_turn(
+    session_id: str, message: str, cache_key
+) -> Tuple[List[Turn], Optional[Dict[str, Any]], Optional[str], bool, Optional[str]]:
+    """
+    (history, summary, FAQ answer, gated, cached response) for one turn.
+    The FAQ and the relevance gate only apply to first turns and are checked
+    before the response cache, so their answers are not counted as misses.
+    """
+    local = {"faq": None, "gated": False}
+
+    def serve_locally() -> bool:
+        local["faq"] = faq_answer(message, None)
+        local["gated"] = local["faq"] is None and off_topic(message, None)
+        return local["faq"] is not None or local["gated"]
+
+    with span("session"):
+        history, summary, cached_response = await STATE.lookup(session_id, cache_key, serve_locally)
+    return history, summary, local["faq"], local["gated"], cached_response
+
+
+async def stale_fallback(cache_key, history: Optional[List[Turn]], error: HTTPException) -> Optional[str]:
+    """While upstream is failing, an expired cached answer beats an error page."""
+    if history or error.status_code < 500:
+        return None
+    return await STATE.get_stale(cache_key)
+
+
+def sse_event(data: Dict, event: Optional[str] = None) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
 
 # --- API Endpoints ---
 @app.get("/", response_model=Dict[str, str])
 async def root():
     return {"message": "AI Chatbot API is running!"}
 
+async def finish_turn(
+    session_id: str,
+    message: str,
+    ai_response: str,
+    source: str,
+    cache_key,
+    history: List[Turn],
+    summary: Optional[Dict[str, Any]],
+) -> None:
+    """
+    Bookkeeping once an answer is complete, shared by every chat endpoint:
+    caches first-turn upstream answers, counts summary savings, and records
+    the turn in its session, the archive and the summarizer. The answer is
+    already complete, so a failure here (e.g. the shared database is locked)
+    is logged rather than turned into an error for the client.
+    """
+    if source == "upstream":
+        if ai_response and not history:
+            try:
+                await STATE.set_response(cache_key, ai_response)
+            except Exception:
+                log.exception("turn_record_failed", step="cache")
+        if summary is not None and SUMMARIZER is not None:
+            SUMMARIZER.record_use(session_id, history, summary)
+    CHAT_RESPONSES.labels(source).inc()
+    if not ai_response:
+        return
+    if ARCHIVE is not None:
+        ARCHIVE.record(session_id, message, ai_response, source)
+    try:
+        await STATE.append(session_id, message, ai_response)
+    except Exception:
+        # Without the turn in the session there is nothing to summarize.
+        log.exception("turn_record_failed", step="session")
+        return
+    if SUMMARIZER is not None:
+        SUMMARIZER.schedule(session_id, history + [(message, ai_response)], summary)
+
+
+async def answer_message(chat_message: ChatMessage) -> ChatResponse:
+    """
+    Answers one message through the FAQ, relevance gate, response cache,
+    upstream call (with coalescing) and stale fallback, and records the
+    turn in its session. response.source says where the answer came from.
+    """
+    session_id = chat_message.session_id or str(uuid.uuid4())
+    bind(session_id=session_id)
+    # Answers to follow-up turns depend on the history, so only
+    # first turns are served from or stored in the response cache.
+    cache_key = response_cache_key(chat_message.message)
+    history, summary, faq, gated, cached_response = await lookup_turn(session_id, chat_message.message, cache_key)
+
+    if faq is not None:
+        ai_response, source = faq, "faq"
+    elif gated:
+        ai_response, source = REFUSAL, "gate"
+    else:
+        ai_response, source = cached_response, "cache"
+    cached = source == "cache" and ai_response is not None
+    if ai_response is None:
+        try:
+            ai_response = await call_llm_with_retry(chat_message.message, history=history, summary=summary)
+            source = "upstream"
+        except HTTPException as e:
+            ai_response = await stale_fallback(cache_key, history, e)
+            if ai_response is None:
+                raise
+            cached = True
+            source = "stale"
+    await finish_turn(session_id, chat_message.message, ai_response, source, cache_key, history, summary)
+
+    response = ChatResponse(
+        response=ai_response,
+        session_id=session_id,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        cached=cached,
+        source=source
+    )
+    return response
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(chat_message: ChatMessage):
+    mark("handler_start")
+    bind_request()
     try:
-        session_id = chat_message.session_id or str(uuid.uuid4())
-        ai_response = await call_cohere_stream_with_retry(chat_message.message)
-
-        return ChatResponse(
-            response=ai_response,
-            session_id=session_id,
-            timestamp=datetime.now(timezone.utc).isoformat()
-        )
+        with span("init"):
+            await require_ready()
+        with span("knowledge"):
+            await KNOWLEDGE.refresh()
+        response = await answer_message(chat_message)
+        annotate(session_id=response.session_id, source=response.source)
+        mark("handler_done")
+        return response
 
     except HTTPException as e:
         raise e
     except Exception as e:
-        traceback.print_exc()
+        log.exception("chat_failed")
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
-@app.get("/health", response_model=Dict[str, str])
+@app.post("/chat/batch")
+async def chat_batch_endpoint(messages: List[ChatMessage], parallelism: int = BATCH_MAX_PARALLELISM):
+    """
+    Answers many messages with at most `parallelism` (capped by
+    BATCH_MAX_PARALLELISM) in flight, streaming one NDJSON line per message
+    as soon as it completes. Lines carry the message's index, since they
+    arrive in completion order. Messages that share a session_id are
+    answered in order so each sees the previous turn.
+    """
+    if len(messages) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(messages)} messages (max {BATCH_MAX_ITEMS})")
+    bind_request()
+    await require_ready()
+    await KNOWLEDGE.refresh()
+    workers = max(1, min(parallelism, BATCH_MAX_PARALLELISM, len(messages)))
+    session_locks: Dict[str, asyncio.Lock] = {}
+    pending = iter(enumerate(messages))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def answer_one(index: int, chat_message: ChatMessage) -> Dict:
+        try:
+            if chat_message.session_id:
+                lock = session_locks.setdefault(chat_message.session_id, asyncio.Lock())
+                async with lock:
+                    response = await answer_message(chat_message)
+            else:
+                response = await answer_message(chat_message)
+            return {"index": index, **response.model_dump()}
+        except HTTPException as e:
+            return {"index": index, "status": e.status_code, "detail": e.detail}
+        except Exception as e:
+            log.exception("chat_failed", index=index)
+            return {"index": index, "status": 500, "detail": f"Error generating response: {str(e)}"}
+
+    async def worker():
+        for index, chat_message in pending:
+            await results.put(await answer_one(index, chat_message))
+
+    async def lines():
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            for _ in range(len(messages)):
+                yield json.dumps(await results.get(), ensure_ascii=False) + "\n"
+        finally:
+            # The client may disconnect mid-batch; stop issuing upstream calls.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+class StreamPlan:
+    """Where a streamed answer will come from, decided before the first byte is sent."""
+
+    def __init__(
+        self,
+        message: str,
+        session_id: str,
+        cache_key,
+        history: List[Turn],
+        summary: Optional[Dict[str, Any]],
+        faq: Optional[str],
+        gated: bool,
+        cached_response: Optional[str],
+    ):
+        self.message = message
+        self.session_id = session_id
+        self.cache_key = cache_key
+        self.history = history
+        self.summary = summary
+        self.faq = faq
+        self.gated = gated
+        self.cached_response = cached_response
+
+    @classmethod
+    async def create(cls, message: str, session_id: str) -> "StreamPlan":
+        cache_key = response_cache_key(message)
+        return cls(message, session_id, cache_key, *await lookup_turn(session_id, message, cache_key))
+
+    @property
+    def needs_upstream(self) -> bool:
+        return self.faq is None and not self.gated and self.cached_response is None
+
+
+async def stream_events(plan: StreamPlan) -> AsyncIterator[Tuple[Optional[str], Dict]]:
+    """
+    Streams one answer as (event, data) pairs: (None, {"text": ...}) per
+    chunk, then a final "done" or "error" event. Shared by the SSE and
+    WebSocket endpoints, which only differ in framing.
+    """
+    started = time.perf_counter()
+    first_token_ms = None
+    cached_response = plan.cached_response
+    chunks = []
+    try:
+        if plan.faq is not None:
+            source, chunk_source = "faq", _single_chunk(plan.faq)
+        elif plan.gated:
+            source, chunk_source = "gate", _single_chunk(REFUSAL)
+        elif cached_response is not None:
+            source, chunk_source = "cache", _single_chunk(cached_response)
+        else:
+            source, chunk_source = "upstream", answer_stream(plan.message, plan.history, plan.summary)
+        async for chunk in chunk_source:
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - started) * 1000
+            chunks.append(chunk)
+            yield None, {"text": chunk}
+    except HTTPException as e:
+        stale = None if chunks else await stale_fallback(plan.cache_key, plan.history, e)
+        if stale is None:
+            yield "error", {"detail": e.detail, "session_id": plan.session_id}
+            return
+        cached_response = stale
+        source = "stale"
+        first_token_ms = (time.perf_counter() - started) * 1000
+        chunks.append(stale)
+        yield None, {"text": stale}
+    except Exception as e:
+        log.exception("chat_stream_failed")
+        yield "error", {"detail": f"Error generating response: {str(e)}", "session_id": plan.session_id}
+        return
+
+    ai_response = "".join(chunks).strip()
+    await finish_turn(
+        plan.session_id, plan.message, ai_response, source, plan.cache_key, plan.history, plan.summary
+    )
+    annotate(source=source)
+
+    yield "done", {
+        "session_id": plan.session_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "time_to_first_token_ms": round(first_token_ms, 2) if first_token_ms is not None else None,
+        "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        "chunks": len(chunks),
+        "cached": cached_response is not None,
+        "source": source,
+    }
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(chat_message: ChatMessage):
+    mark("handler_start")
+    session_id = chat_message.session_id or str(uuid.uuid4())
+    annotate(session_id=session_id)
+    bind_request(session_id=session_id)
+    with span("init"):
+        await require_ready()
+    with span("knowledge"):
+        await KNOWLEDGE.refresh()
+    plan = await StreamPlan.create(chat_message.message, session_id)
+
+    if plan.needs_upstream:
+        # Once the stream starts the status is already 200, so reject
+        # up front while the status code can still say "overloaded".
+        try:
+            ADMISSION.check()
+        except Overloaded as e:
+            raise upstream_error(503, f"Server overloaded: {e}", e.retry_after)
+
+    async def event_source():
+        async for event, data in stream_events(plan):
+            yield sse_event(data, event=event)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _websocket_turn(websocket: WebSocket, session_id: str, kind: str, message: Optional[str]) -> None:
+    if kind == "reset":
+        await STATE.reset(session_id)
+        await websocket.send_json({"type": "reset", "session_id": session_id})
+        return
+    if kind != "message" or not isinstance(message, str) or not message.strip():
+        await websocket.send_json({"type": "error", "detail": "Expected {\"message\": \"...\"}"})
+        return
+
+    await KNOWLEDGE.refresh()
+    plan = await StreamPlan.create(message, session_id)
+    if plan.needs_upstream:
+        try:
+            ADMISSION.check()
+        except Overloaded as e:
+            await websocket.send_json({
+                "type": "error", "detail": f"Server overloaded: {e}", "retry_after": e.retry_after
+            })
+            return
+    async for event, data in stream_events(plan):
+        await websocket.send_json({"type": event or "text", **data})
+
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    One long-lived connection per chat session. The client sends
+    {"message": ...} frames (plus {"type": "reset"} and {"type": "ping"});
+    each answer streams back as {"type": "text"} frames followed by a
+    {"type": "done"} or {"type": "error"} frame. Turns on one socket are
+    answered in order.
+
+    The server sends {"type": "ping"} after WS_HEARTBEAT_INTERVAL of
+    silence and closes the socket when the client has sent nothing for two
+    intervals (a dead peer) or no message for WS_IDLE_TIMEOUT.
+    """
+    # Browsers always send Origin, so this stops other sites from driving
+    # the bot; non-browser clients without one are allowed, as over HTTP.
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in ALLOWED_ORIGINS:
+        log.warning("websocket_rejected", reason="origin", origin=origin)
+        await websocket.close(code=1008, reason="Origin not allowed")
+        return
+    if len(WEBSOCKETS) >= WS_MAX_CONNECTIONS:
+        await websocket.close(code=1013, reason="Too many connections")
+        return
+    await websocket.accept()
+    try:
+        await require_ready()
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "detail": e.detail})
+        await websocket.close(code=1011)
+        return
+
+    session_id = session_id or str(uuid.uuid4())
+    bind(session_id=session_id)
+    WEBSOCKETS.add(websocket)
+    last_frame = last_message = time.monotonic()
+    try:
+        await websocket.send_json({"type": "ready", "session_id": session_id})
+        while True:
+            try:
+                received = await asyncio.wait_for(websocket.receive(), WS_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                now = time.monotonic()
+                if now - last_message >= WS_IDLE_TIMEOUT:
+                    log.info("websocket_closed", reason="idle")
+                    await websocket.close(code=1000, reason="Idle timeout")
+                    return
+                if now - last_frame >= 2 * WS_HEARTBEAT_INTERVAL:
+                    log.info("websocket_closed", reason="heartbeat")
+                    await websocket.close(code=1001, reason="Heartbeat timeout")
+                    return
+                await websocket.send_json({"type": "ping"})
+                continue
+
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
+            last_frame = time.monotonic()
+            raw = received.get("text")
+            if raw is None:
+                await websocket.send_json({"type": "error", "detail": "Binary frames are not supported"})
+                continue
+            try:
+                frame = json.loads(raw)
+                kind = frame.get("type", "message")
+            except (ValueError, AttributeError):
+                await websocket.send_json({"type": "error", "detail": "Frames must be JSON objects"})
+                continue
+            if kind == "pong":
+                continue
+            if kind == "ping":
+                await websocket.send_json({"type": "pong"})
+                continue
+            last_message = last_frame
+            try:
+                await _websocket_turn(websocket, session_id, kind, frame.get("message"))
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                # As in /chat: a failing store or lookup costs this turn,
+                # not the connection.
+                log.exception("chat_failed")
+                await websocket.send_json({"type": "error", "detail": f"Error generating response: {str(e)}"})
+            last_message = time.monotonic()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        WEBSOCKETS.discard(websocket)
+
+@app.get("/health", response_model=Dict[str, Any])
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
+    upstream = UPSTREAM_BREAKER.snapshot()
+    return {
+        "status": "healthy" if upstream["state"] == CircuitBreaker.CLOSED else "degraded",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "upstream": upstream,
+        "websockets": len(WEBSOCKETS)
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    await require_ready()
+    return {**await STATE.cache_stats(), "knowledge_version": KNOWLEDGE.version}
+
+@app.get("/upstream/stats")
+async def upstream_stats():
+    return {**UPSTREAM_FLIGHTS.stats(), "context": CONTEXT_STATS, "admission": ADMISSION.stats()}
+
+@app.get("/archive/stats")
+async def archive_stats():
+    return ARCHIVE.stats() if ARCHIVE is not None else {"directory": None}
+
+@app.get("/logs/stats")
+async def log_stats():
+    return LOGS.stats()
+
+@app.get("/knowledge/stats")
+async def knowledge_stats():
+    await require_ready()
+    return KNOWLEDGE.stats()
+
+@app.get("/faq/stats")
+async def faq_stats():
+    await require_ready()
+    return FAQ.stats() if FAQ is not None else {"entries": 0, "path": FAQ_PATH}
+
+@app.get("/startup/stats")
+async def startup_stats():
+    return {"ready": ensure_ready.done, "phases_ms": STARTUP.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    STATE_SIZES.clear()
+    STATE_SIZES.update(await STATE.sizes())
+    return Response(METRICS.render(), media_type=CONTENT_TYPE)
+
+@app.get("/sessions/stats")
+async def session_stats():
+    stats = await STATE.session_stats()
+    if SUMMARIZER is not None:
+        stats["summaries"] = SUMMARIZER.stats()
+    return stats
+
+@app.get("/sessions/{session_id}/summary")
+async def session_summary(session_id: str):
+    """The session's rolling summary and the prompt tokens it saves."""
+    if SUMMARIZER is None:
+        return {"session_id": session_id, "enabled": False}
+    history, summary = await STATE.conversation(session_id)
+    return SUMMARIZER.session_report(session_id, history, summary)
 
 @app.post("/reset-chat/{session_id}", response_model=ResetResponse)
 async def reset_chat(session_id: str):
-    return {"message": f"Session ID '{session_id}' reset (no session state stored)."}
+    if await STATE.reset(session_id):
+        return {"message": f"Chat session '{session_id}' reset."}
+    return {"message": f"Session ID '{session_id}' not found (nothing to reset)."}
+
+@app.on_event("startup")
+async def startup():
+    # Long-running servers warm up before accepting traffic; serverless
+    # platforms may skip startup events and initialize on the first request.
+    await ensure_ready()
+    # Picks up edits even when no requests arrive; per-request refresh()
+    # covers platforms that freeze the process between requests.
+    app.state.knowledge_watcher = asyncio.create_task(KNOWLEDGE.watch())
+    if ARCHIVE is not None:
+        # record() also starts it, for platforms that skip startup events.
+        ARCHIVE.start()
+
+@app.on_event("shutdown")
+async def flush_exporters():
+    if ARCHIVE is not None:
+        await ARCHIVE.close()
+    if SUMMARIZER is not None:
+        await SUMMARIZER.close()
+    await STATE.close()
+    if TRACE_EXPORTER is not None:
+        TRACE_EXPORTER.close()
+    LOGS.close()
+
+STARTUP.record("import", time.perf_counter() - _import_started)
 
 if __name__ == "__main__":
     import uvicorn
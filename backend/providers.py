@@ -0,0 +1,198 @@
+import asyncio
+import random
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from sessions import Turn
+
+
+@dataclass
+class LLMRequest:
+    message: str
+    preamble: str
+    history: List[Turn] = field(default_factory=list)
+    documents: List[Dict] = field(default_factory=list)
+    temperature: float = 0.3
+
+
+class ProviderError(Exception):
+    """Provider failure carrying an HTTP-like status so the retry policy can classify it."""
+
+    def __init__(self, message: str, status_code: int = 502, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class LLMProvider:
+    """
+    Upstream chat model. Subclasses implement stream(); complete() joins it.
+    Retries, coalescing and caching live above this layer, so providers make
+    exactly one upstream attempt per call.
+    """
+
+    name = "base"
+    model = ""
+
+    def stream(self, request: LLMRequest) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def complete(self, request: LLMRequest) -> str:
+        parts = []
+        async for chunk in self.stream(request):
+            parts.append(chunk)
+        return "".join(parts)
+
+
+class CohereProvider(LLMProvider):
+    name = "cohere"
+
+    def __init__(self, api_key: str, model: str = "command-r-plus"):
+        import cohere
+
+        self.client = cohere.AsyncClient(api_key)
+        self.model = model
+
+    async def stream(self, request: LLMRequest) -> AsyncIterator[str]:
+        kwargs = dict(
+            message=request.message,
+            model=self.model,
+            temperature=request.temperature,
+            preamble=request.preamble,
+            prompt_truncation="AUTO"
+        )
+        if request.documents:
+            kwargs["documents"] = request.documents
+        if request.history:
+            chat_history = []
+            for user_message, bot_response in request.history:
+                chat_history.append({"role": "USER", "message": user_message})
+                chat_history.append({"role": "CHATBOT", "message": bot_response})
+            kwargs["chat_history"] = chat_history
+
+        async for event in self.client.chat_stream(**kwargs):
+            if event.event_type == "text-generation" and event.text:
+                yield event.text
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = "gemini-2.0-flash"):
+        import google.generativeai as genai
+        from google.api_core.exceptions import GoogleAPICallError
+
+        genai.configure(api_key=api_key)
+        self.client = genai.GenerativeModel(model)
+        self.model = model
+        self._api_error = GoogleAPICallError
+
+    @staticmethod
+    def _contents(request: LLMRequest) -> List[Dict]:
+        # Gemini has no separate preamble/documents fields, so both are
+        # folded into the first user message.
+        grounding = [request.preamble]
+        for doc in request.documents:
+            grounding.append(f"[{doc.get('title', '')}] {doc.get('text', '')}")
+        contents = [
+            {"role": "user", "parts": ["\n\n".join(grounding)]},
+            {"role": "model", "parts": ["Understood."]},
+        ]
+        for user_message, bot_response in request.history:
+            contents.append({"role": "user", "parts": [user_message]})
+            contents.append({"role": "model", "parts": [bot_response]})
+        contents.append({"role": "user", "parts": [request.message]})
+        return contents
+
+    def _provider_error(self, e: Exception) -> ProviderError:
+        # google.api_core errors carry the HTTP status as .code, which the
+        # retry policy and breaker do not read.
+        response = getattr(e, "response", None)
+        headers = dict(getattr(response, "headers", None) or {})
+        status = e.code if isinstance(e.code, int) else 502
+        return ProviderError(f"{type(e).__name__}: {e}", status_code=status, headers=headers)
+
+    async def stream(self, request: LLMRequest) -> AsyncIterator[str]:
+        try:
+            response = await self.client.generate_content_async(
+                self._contents(request),
+                generation_config={"temperature": request.temperature},
+                stream=True
+            )
+            async for chunk in response:
+                if hasattr(chunk, "text") and chunk.text:
+                    yield chunk.text
+        except self._api_error as e:
+            raise self._provider_error(e) from e
+
+
+REFUSAL = "I'm sorry, I can only answer questions related to Zordly or its services."
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic offline stand-in for load tests and benchmarks.
+
+    Answers by quoting the retrieved documents (or the refusal when there
+    are none), after first_token_latency seconds, emitting one word every
+    1/tokens_per_second seconds. error_rate injects retryable 503s from a
+    seeded RNG so failure handling can be exercised reproducibly.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        first_token_latency: float = 0.2,
+        tokens_per_second: float = 50.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        model: str = "fake-echo"
+    ):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.model = model
+        self._rng = random.Random(seed)
+
+    @staticmethod
+    def answer(request: LLMRequest) -> str:
+        if not request.documents:
+            return REFUSAL
+        return " ".join(doc.get("text", "") for doc in request.documents)
+
+    async def stream(self, request: LLMRequest) -> AsyncIterator[str]:
+        if self.error_rate and self._rng.random() < self.error_rate:
+            await asyncio.sleep(self.first_token_latency)
+            raise ProviderError("fake provider injected failure", status_code=503)
+
+        await asyncio.sleep(self.first_token_latency)
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        words = self.answer(request).split(" ")
+        for i, word in enumerate(words):
+            if i and interval:
+                await asyncio.sleep(interval)
+            yield word if i == len(words) - 1 else word + " "
+
+
+def create_provider(name: str, get_setting: Callable[[str, object], object]) -> LLMProvider:
+    """Builds the provider named by LLM_PROVIDER, reading only the settings it needs."""
+    name = name.lower()
+    if name == "cohere":
+        api_key = get_setting("COHERE_API_KEY", None)
+        if not api_key:
+            raise RuntimeError("COHERE_API_KEY not found in environment")
+        return CohereProvider(api_key, str(get_setting("COHERE_MODEL", "command-r-plus")))
+    if name == "gemini":
+        api_key = get_setting("GEMINI_API_KEY", None)
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY not found in environment")
+        return GeminiProvider(api_key, str(get_setting("GEMINI_MODEL", "gemini-2.0-flash")))
+    if name == "fake":
+        return FakeProvider(
+            first_token_latency=float(get_setting("FAKE_LLM_LATENCY", 0.2)),
+            tokens_per_second=float(get_setting("FAKE_LLM_TOKENS_PER_SECOND", 50)),
+            error_rate=float(get_setting("FAKE_LLM_ERROR_RATE", 0)),
+            seed=int(get_setting("FAKE_LLM_SEED", 0)),
+        )
+    raise RuntimeError(f"Unknown LLM_PROVIDER '{name}' (expected cohere, gemini or fake)")
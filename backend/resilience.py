@@ -0,0 +1,169 @@
+import asyncio
+import random
+import sys
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+def status_of(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Timeouts, connection failures, rate limits and 5xx are worth retrying; other 4xx are not."""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # httpx is only loaded by the provider SDKs. If it was never imported no
+    # httpx error can occur, so the check does not pay for the import.
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(exc, httpx.TransportError):
+        return True
+    status = status_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return False
+
+
+def retry_after_of(exc: BaseException) -> Optional[float]:
+    """Seconds requested by an upstream Retry-After header, if the error carries one."""
+    headers = getattr(exc, "headers", None) or {}
+    value = None
+    for name, header_value in headers.items():
+        if name.lower() == "retry-after":
+            value = header_value
+            break
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Capped exponential backoff with full jitter, bounded by a per-request
+    deadline. A delay that would overrun the deadline ends the retries
+    instead of sleeping through it. Once a stream has started, each further
+    chunk must arrive within idle_timeout.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 4.0,
+        deadline: float = 10.0,
+        idle_timeout: float = 30.0,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.idle_timeout = idle_timeout
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def next_delay(self, attempt: int, exc: BaseException, remaining: float) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up."""
+        if attempt + 1 >= self.max_attempts or not is_retryable(exc):
+            return None
+        delay = self.backoff(attempt, retry_after_of(exc))
+        if delay >= remaining:
+            return None
+        return delay
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream circuit open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Shared upstream health switch.
+
+    After failure_threshold consecutive retryable failures the breaker opens
+    and calls fail fast for recovery_time seconds. It then lets a single
+    probe through (half-open); success closes it, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.recovery_time - time.monotonic())
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError when the call should not reach upstream."""
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.retry_after())
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.recovery_time)
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release(self) -> None:
+        """
+        Ends a call that got no verdict (cancelled, or its consumer went
+        away), so a half-open breaker lets the next call probe.
+        """
+        self._probe_in_flight = False
+
+    def record_failure(self, exc: BaseException) -> None:
+        if not is_retryable(exc):
+            # A bad request says nothing about upstream health, but it
+            # still ends a half-open probe.
+            self._probe_in_flight = False
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "probe_in_flight": self._probe_in_flight,
+            "retry_after": round(self.retry_after(), 1) if self.state == self.OPEN else 0.0,
+        }
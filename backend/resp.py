@@ -0,0 +1,192 @@
+"""
+Minimal asyncio client for the Redis protocol (RESP2), with a connection
+pool and pipelining.
+
+pipeline() writes any number of commands in one write and reads their
+replies in order, so a group of commands costs a single round trip. Idle
+connections are reused LIFO (the most recently used socket is the one
+least likely to have been closed by the server); at most pool_size are
+open at once and further callers wait for one to be released. Works
+against Redis, Valkey, KeyDB or any server speaking RESP2.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import unquote, urlsplit
+
+
+class RedisError(Exception):
+    """An error reply from the server, or a connection that failed mid-command."""
+
+
+def encode_command(args: Sequence[Any]) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n" % len(arg))
+        parts.append(arg)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Reads one reply. Error replies are returned as RedisError, not raised."""
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed by server")
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body.decode("utf-8")
+    if prefix == b"-":
+        return RedisError(body.decode("utf-8"))
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if prefix == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise RedisError(f"unexpected reply prefix {prefix!r}")
+
+
+class _Connection:
+    __slots__ = ("reader", "writer")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class RedisClient:
+    def __init__(self, url: str = "redis://localhost:6379/0", pool_size: int = 16, timeout: float = 2.0):
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError(f"unsupported Redis URL scheme '{parts.scheme}' (expected redis://)")
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.username = unquote(parts.username) if parts.username else None
+        self.password = unquote(parts.password) if parts.password else None
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: List[_Connection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.opened = 0
+        self.round_trips = 0
+        self.commands = 0
+
+    # --- Pool ---
+    async def _open(self) -> _Connection:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        conn = _Connection(reader, writer)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            try:
+                for reply in await self._roundtrip(conn, setup):
+                    if isinstance(reply, RedisError):
+                        raise reply
+            except BaseException:
+                conn.close()
+                raise
+        self.opened += 1
+        return conn
+
+    async def _roundtrip(self, conn: _Connection, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        conn.writer.write(b"".join(encode_command(command) for command in commands))
+
+        async def exchange():
+            await conn.writer.drain()
+            return [await read_reply(conn.reader) for _ in commands]
+
+        return await asyncio.wait_for(exchange(), self.timeout)
+
+    async def _send(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        reused = bool(self._idle)
+        conn = self._idle.pop() if reused else await self._open()
+        try:
+            replies = await self._roundtrip(conn, commands)
+        except asyncio.TimeoutError:
+            # Unread replies may still arrive on this socket.
+            conn.close()
+            raise
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            conn.close()
+            if not reused:
+                raise
+            # The server may have closed an idle socket; retry once on a new one.
+            return await self._send_fresh(commands)
+        except BaseException:
+            conn.close()
+            raise
+        self._idle.append(conn)
+        return replies
+
+    async def _send_fresh(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        conn = await self._open()
+        try:
+            replies = await self._roundtrip(conn, commands)
+        except BaseException:
+            conn.close()
+            raise
+        self._idle.append(conn)
+        return replies
+
+    # --- Commands ---
+    async def pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """Sends all commands in one write; returns replies in order. Raises on the first error reply."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            try:
+                replies = await self._send(commands)
+            except asyncio.TimeoutError as e:
+                raise RedisError(f"{self.host}:{self.port} timed out after {self.timeout}s") from e
+            except (ConnectionError, asyncio.IncompleteReadError, OSError) as e:
+                raise RedisError(f"connection to {self.host}:{self.port} failed: {e}") from e
+        self.round_trips += 1
+        self.commands += len(commands)
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    async def execute(self, *args: Any) -> Any:
+        return (await self.pipeline([args]))[0]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if ttl:
+            await self.execute("SET", key, value, "PX", max(1, int(ttl * 1000)))
+        else:
+            await self.execute("SET", key, value)
+
+    async def delete(self, *keys: str) -> int:
+        return await self.execute("DEL", *keys)
+
+    async def close(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "url": f"redis://{self.host}:{self.port}/{self.db}",
+            "pool_size": self.pool_size,
+            "idle_connections": len(self._idle),
+            "connections_opened": self.opened,
+            "round_trips": self.round_trips,
+            "commands": self.commands,
+        }
@@ -0,0 +1,146 @@
+import heapq
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its "
+    "me my of on or our so that the their them there this to was we what when "
+    "where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def document_terms(doc: Dict, title_weight: int = 2) -> List[str]:
+    return tokenize(doc.get("title", "")) * title_weight + tokenize(doc.get("text", ""))
+
+
+def bm25_idf(n_docs: int, df: int) -> float:
+    return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+STEM_SUFFIXES = ("ing", "ed", "es", "s", "e")
+
+# Words that carry no topic on their own; a message made only of these is
+# small talk, which the model should handle rather than a relevance gate.
+SMALL_TALK = frozenset(
+    "hi hello hey hiya thanks thank please ok okay yes yeah no bye goodbye "
+    "morning afternoon evening good great cool help".split()
+)
+
+
+def stem(term: str) -> str:
+    """Strips one common suffix, so "messages"/"messaging" and "conference"/"conferencing" meet."""
+    for suffix in STEM_SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 4:
+            return term[:-len(suffix)]
+    return term
+
+
+def stem_vocabulary(terms: Iterable[str]) -> Set[str]:
+    return {stem(term) for term in terms}
+
+
+def term_coverage(query: str, vocabulary: Set[str]) -> Optional[float]:
+    """
+    Share of the query's distinct content terms (stemmed) that occur
+    anywhere in the knowledge base, from 0.0 (none) to 1.0 (all). None when
+    the query has no content terms at all, e.g. a bare greeting.
+    """
+    terms = {stem(term) for term in tokenize(query) if term not in SMALL_TALK}
+    if not terms:
+        return None
+    return sum(1 for term in terms if term in vocabulary) / len(terms)
+
+
+class KnowledgeIndex:
+    """
+    In-process BM25 inverted index over knowledge documents.
+
+    Documents are the same {"title", "text"} dicts that live in Knowledge.json.
+    Title terms are counted twice so a match on "Features" outranks a passing
+    mention in another document's body.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, title_weight: int = 2):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self.documents: Dict[int, Dict] = {}
+        self.total_length = 0
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def from_documents(cls, documents: List[Dict], **kwargs) -> "KnowledgeIndex":
+        index = cls(**kwargs)
+        for doc in documents:
+            index.add(doc)
+        return index
+
+    def add(self, doc: Dict) -> int:
+        doc_id = self._next_id
+        self._next_id += 1
+
+        terms = document_terms(doc, self.title_weight)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+        self.documents[doc_id] = doc
+        self.doc_lengths[doc_id] = len(terms)
+        self.doc_terms[doc_id] = tuple(counts)
+        self.total_length += len(terms)
+        return doc_id
+
+    def remove(self, doc_id: int) -> None:
+        """Drops one document, touching only the posting lists of its own terms."""
+        for term in self.doc_terms.pop(doc_id):
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        del self.documents[doc_id]
+
+    def score(self, query: str) -> Dict[int, float]:
+        n_docs = len(self.documents)
+        if not n_docs:
+            return {}
+        avg_length = self.total_length / n_docs or 1.0
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = bm25_idf(n_docs, len(postings))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Tuple[Dict, float]]:
+        scores = self.score(query)
+        ranked = heapq.nlargest(
+            top_k,
+            ((doc_id, s) for doc_id, s in scores.items() if s >= min_score),
+            key=lambda item: item[1],
+        )
+        return [(self.documents[doc_id], s) for doc_id, s in ranked]
+
+    def top_documents(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Dict]:
+        return [doc for doc, _ in self.search(query, top_k, min_score)]
@@ -0,0 +1,49 @@
+"""
+Production entry point: runs the app in several uvicorn worker processes
+behind one listening socket.
+
+Workers share the response cache and chat sessions through a SQLite
+database in WAL mode (see shared.py), so a session can continue on any
+worker. Each worker gets an equal share of UPSTREAM_MAX_CONCURRENCY and
+UPSTREAM_MAX_QUEUE. Knowledge, FAQ and metrics stay per worker.
+
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import os
+
+import uvicorn
+
+from shared import connect
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument("--state", default=os.getenv("SHARED_STATE_PATH", "state.db"), help="shared SQLite database")
+    parser.add_argument("--log-level", default="warning", help="uvicorn's own log level")
+    args = parser.parse_args()
+
+    # Settings reach the workers through the environment.
+    os.environ["WORKERS"] = str(args.workers)
+    if args.workers > 1:
+        os.environ["SHARED_STATE_PATH"] = os.path.abspath(args.state)
+        # Create the schema and switch to WAL once, before workers race to.
+        connect(os.environ["SHARED_STATE_PATH"]).close()
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        # Access lines would be printed on the event loop; requests are
+        # covered by traces and metrics.
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Rough CPython cost of a Session object, its turn list and one (user, bot)
+# tuple with two str headers. Used only for the global memory cap, so it
+# needs to be in the right ballpark rather than exact.
+SESSION_OVERHEAD_BYTES = 260
+TURN_OVERHEAD_BYTES = 170
+
+Turn = Tuple[str, str]
+
+
+class Session:
+    __slots__ = ("turns", "last_seen", "size", "summary")
+
+    def __init__(self, now: float):
+        self.turns: List[Turn] = []
+        self.last_seen = now
+        self.size = SESSION_OVERHEAD_BYTES
+        self.summary: Optional[Dict[str, Any]] = None
+
+
+def turn_size(turn: Turn) -> int:
+    return TURN_OVERHEAD_BYTES + len(turn[0]) + len(turn[1])
+
+
+def summary_size(summary: Optional[Dict[str, Any]]) -> int:
+    return 0 if summary is None else TURN_OVERHEAD_BYTES + len(summary["text"])
+
+
+class SessionStore:
+    """
+    Bounded in-memory chat history keyed by session_id.
+
+    Each turn is stored as a plain (user_message, bot_response) tuple and a
+    session keeps at most max_turns of them. Sessions sit in an OrderedDict
+    in least-recently-used order, which makes idle expiry and eviction O(1)
+    per session: expired or surplus sessions are always at the front.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 10,
+        idle_ttl: float = 1800.0,
+        max_sessions: int = 100_000,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.total_bytes = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _drop(self, session_id: str) -> Session:
+        session = self._sessions.pop(session_id)
+        self.total_bytes -= session.size
+        return session
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.idle_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def _enforce_limits(self) -> None:
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions or self.total_bytes > self.max_bytes
+        ):
+            self._drop(next(iter(self._sessions)))
+            self.evicted += 1
+
+    def history(self, session_id: str, now: Optional[float] = None) -> List[Turn]:
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+        session.last_seen = now
+        self._sessions.move_to_end(session_id)
+        return list(session.turns)
+
+    def append(self, session_id: str, user_message: str, bot_response: str, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(now)
+            self._sessions[session_id] = session
+            self.total_bytes += session.size
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_seen = now
+
+        turn = (user_message, bot_response)
+        session.turns.append(turn)
+        added = turn_size(turn)
+        while len(session.turns) > self.max_turns:
+            added -= turn_size(session.turns.pop(0))
+        session.size += added
+        self.total_bytes += added
+
+        self._enforce_limits()
+
+    def summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The session's rolling summary (see summarize.py); call after history()."""
+        session = self._sessions.get(session_id)
+        return None if session is None else session.summary
+
+    def fold(self, session_id: str, summary: Dict[str, Any], folded: List[Turn]) -> bool:
+        """
+        Replaces the session's oldest turns, which must still be `folded`,
+        with `summary`. Returns False if the session changed meanwhile.
+        """
+        session = self._sessions.get(session_id)
+        if session is None or session.turns[:len(folded)] != folded:
+            return False
+        added = summary_size(summary) - summary_size(session.summary) - sum(turn_size(turn) for turn in folded)
+        del session.turns[:len(folded)]
+        session.summary = summary
+        session.size += added
+        self.total_bytes += added
+        return True
+
+    def reset(self, session_id: str) -> bool:
+        if session_id not in self._sessions:
+            return False
+        self._drop(session_id)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "approx_bytes": self.total_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
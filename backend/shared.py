@@ -0,0 +1,308 @@
+"""
+Response cache and session store shared by all worker processes through
+one SQLite database in WAL mode.
+
+WAL lets readers run concurrently with the single writer, and with
+synchronous=NORMAL a commit is an append to the -wal file without an
+fsync, so each operation costs tens of microseconds. The classes mirror
+ResponseCache and SessionStore, so main.py can use either. Their calls
+block (on disk, or on another worker holding the write lock), so they are
+marked `blocking` and storage.LocalState runs them in worker threads;
+reads and writes on one connection are serialized by a lock. Hit/miss and
+eviction counters are per process; sizes are read from the database.
+Timestamps are wall-clock, since monotonic clocks differ between
+processes.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+from sessions import SESSION_OVERHEAD_BYTES, Turn, summary_size, turn_size
+
+# Seconds to wait for another worker's write lock before failing. Writes
+# are single-row and take microseconds, so a long wait means trouble.
+BUSY_TIMEOUT = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS response_cache_expires ON response_cache (expires_at);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    turns TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    size INTEGER NOT NULL,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Opens (and on first use creates) the shared database."""
+    # Autocommit; multi-statement updates use explicit BEGIN IMMEDIATE.
+    db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    columns = {row[1] for row in db.execute("PRAGMA table_info(sessions)")}
+    if "summary" not in columns:
+        # Databases created before rolling summaries.
+        db.execute("ALTER TABLE sessions ADD COLUMN summary TEXT")
+    return db
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, serialized across threads sharing the connection."""
+
+    def __init__(self, db: sqlite3.Connection, lock: threading.Lock):
+        self.db = db
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        try:
+            self.db.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            # "database is locked": __exit__ will not run, so let go here.
+            self.lock.release()
+            raise
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                try:
+                    self.db.execute("COMMIT")
+                    return
+                except sqlite3.Error:
+                    # Don't leave the connection inside the transaction.
+                    self._rollback()
+                    raise
+            self._rollback()
+        finally:
+            self.lock.release()
+
+    def _rollback(self) -> None:
+        if self.db.in_transaction:
+            self.db.execute("ROLLBACK")
+
+
+def _fetchone(db: sqlite3.Connection, lock: threading.Lock, sql: str, params=()):
+    with lock:
+        return db.execute(sql, params).fetchone()
+
+
+def _key(key: Hashable) -> str:
+    return json.dumps(key, separators=(",", ":"))
+
+
+class SharedResponseCache:
+    """
+    ResponseCache over the shared database. When over max_size, entries
+    closest to expiry are evicted first, which approximates insertion-order
+    LRU without a write per hit.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_size: int = 1024, ttl: float = 300.0):
+        self.db = connect(path)
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def __len__(self) -> int:
+        return _fetchone(self.db, self._lock, "SELECT COUNT(*) FROM response_cache")[0]
+
+    def _lookup(self, key: Hashable):
+        return _fetchone(
+            self.db, self._lock, "SELECT value, expires_at FROM response_cache WHERE key = ?", (_key(key),)
+        )
+
+    def get(self, key: Hashable) -> Optional[str]:
+        row = self._lookup(key)
+        if row is None or row[1] < time.time():
+            # Expired rows stay until evicted so get_stale can still serve them.
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def get_stale(self, key: Hashable) -> Optional[str]:
+        row = self._lookup(key)
+        if row is None:
+            return None
+        self.stale_hits += 1
+        return row[0]
+
+    def set(self, key: Hashable, value: str) -> None:
+        if not self.enabled:
+            return
+        with _Transaction(self.db, self._lock) as db:
+            db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (_key(key), value, time.time() + self.ttl),
+            )
+            surplus = db.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.max_size
+            if surplus > 0:
+                db.execute(
+                    "DELETE FROM response_cache WHERE key IN "
+                    "(SELECT key FROM response_cache ORDER BY expires_at LIMIT ?)",
+                    (surplus,),
+                )
+                self.evictions += surplus
+
+    def clear(self) -> None:
+        with _Transaction(self.db, self._lock) as db:
+            db.execute("DELETE FROM response_cache")
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_hits": self.stale_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "shared": True,
+        }
+
+
+class SharedSessionStore:
+    """
+    SessionStore over the shared database: one row per session holding its
+    turns and rolling summary as JSON. Idle sessions are purged at most
+    every purge_interval seconds rather than on every call. last_seen is
+    refreshed by append() only, so reading a session takes no write lock;
+    idle time counts from the last answered turn.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str,
+        max_turns: int = 10,
+        idle_ttl: float = 1800.0,
+        max_sessions: int = 100_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        purge_interval: float = 5.0,
+    ):
+        self.db = connect(path)
+        self._lock = threading.Lock()
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.purge_interval = purge_interval
+        self._purged_at = 0.0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return _fetchone(self.db, self._lock, "SELECT COUNT(*) FROM sessions")[0]
+
+    def __contains__(self, session_id: str) -> bool:
+        return _fetchone(self.db, self._lock, "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)) is not None
+
+    @property
+    def total_bytes(self) -> int:
+        return _fetchone(self.db, self._lock, "SELECT COALESCE(SUM(size), 0) FROM sessions")[0]
+
+    def _purge(self, db: sqlite3.Connection, now: float) -> None:
+        if now - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = now
+        self.expired += db.execute("DELETE FROM sessions WHERE last_seen < ?", (now - self.idle_ttl,)).rowcount
+        count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        if count > self.max_sessions or size > self.max_bytes:
+            # Drop the least recently seen sessions, at least the surplus
+            # count and at least a tenth of the sessions when over the byte cap.
+            surplus = max(count - self.max_sessions, count // 10 if size > self.max_bytes else 0, 1)
+            self.evicted += db.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY last_seen LIMIT ?)",
+                (surplus,),
+            ).rowcount
+
+    def history(self, session_id: str, now: Optional[float] = None) -> List[Turn]:
+        now = time.time() if now is None else now
+        row = _fetchone(self.db, self._lock, "SELECT turns, last_seen FROM sessions WHERE session_id = ?", (session_id,))
+        if row is None or row[1] < now - self.idle_ttl:
+            return []
+        return [tuple(turn) for turn in json.loads(row[0])]
+
+    def append(self, session_id: str, user_message: str, bot_response: str, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with _Transaction(self.db, self._lock) as db:
+            row = db.execute(
+                "SELECT turns, last_seen, summary FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            live = row is not None and row[1] >= now - self.idle_ttl
+            turns = json.loads(row[0]) if live else []
+            summary = row[2] if live else None
+            turns.append([user_message, bot_response])
+            turns = turns[-self.max_turns:]
+            size = SESSION_OVERHEAD_BYTES + sum(turn_size(turn) for turn in turns) + self._summary_size(summary)
+            db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, turns, last_seen, size, summary) VALUES (?, ?, ?, ?, ?)",
+                (session_id, json.dumps(turns, ensure_ascii=False), now, size, summary),
+            )
+            self._purge(db, now)
+
+    @staticmethod
+    def _summary_size(summary: Optional[str]) -> int:
+        return summary_size(json.loads(summary)) if summary else 0
+
+    def summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = _fetchone(self.db, self._lock, "SELECT summary FROM sessions WHERE session_id = ?", (session_id,))
+        return json.loads(row[0]) if row is not None and row[0] else None
+
+    def fold(self, session_id: str, summary: Dict[str, Any], folded: List[Turn]) -> bool:
+        with _Transaction(self.db, self._lock) as db:
+            row = db.execute("SELECT turns FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return False
+            turns = json.loads(row[0])
+            if [tuple(turn) for turn in turns[:len(folded)]] != [tuple(turn) for turn in folded]:
+                return False
+            turns = turns[len(folded):]
+            size = SESSION_OVERHEAD_BYTES + sum(turn_size(turn) for turn in turns) + summary_size(summary)
+            db.execute(
+                "UPDATE sessions SET turns = ?, size = ?, summary = ? WHERE session_id = ?",
+                (json.dumps(turns, ensure_ascii=False), size, json.dumps(summary, ensure_ascii=False), session_id),
+            )
+            return True
+
+    def reset(self, session_id: str) -> bool:
+        with _Transaction(self.db, self._lock) as db:
+            return db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def stats(self) -> Dict[str, int]:
+        count, size = _fetchone(self.db, self._lock, "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions")
+        return {
+            "sessions": count,
+            "approx_bytes": size,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "shared": True,
+        }
@@ -0,0 +1,91 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+
+class SharedStream:
+    """
+    Fans one upstream async iterator out to any number of subscribers.
+
+    The upstream is drained by its own task, so a subscriber disconnecting
+    never cancels the call for the others. Chunks are buffered, which lets a
+    late subscriber replay everything it missed before following live.
+    """
+
+    def __init__(self, source: AsyncIterator[str]):
+        self._source = source
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, on_done: Callable[[], None]) -> None:
+        self.task = asyncio.create_task(self._pump(on_done))
+
+    async def _pump(self, on_done: Callable[[], None]) -> None:
+        try:
+            async for chunk in self._source:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            on_done()
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            if position < len(self.chunks):
+                chunk = self.chunks[position]
+                position += 1
+                yield chunk
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.chunks) or self.done)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one upstream stream.
+
+    The first caller for a key (the leader) starts the upstream call; callers
+    arriving while it is still running subscribe to the same SharedStream
+    instead of starting their own. The key is released as soon as the
+    upstream finishes, so later calls go through the response cache.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, SharedStream] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        shared = self._inflight.get(key)
+        if shared is None:
+            shared = SharedStream(factory())
+            self._inflight[key] = shared
+            self.leaders += 1
+
+            def release():
+                if self._inflight.get(key) is shared:
+                    del self._inflight[key]
+
+            shared.start(release)
+        else:
+            self.coalesced += 1
+        return shared.subscribe()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
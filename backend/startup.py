@@ -0,0 +1,46 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict
+
+
+class StartupProfile:
+    """Wall-clock milliseconds per startup phase (import, knowledge, provider, ...)."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = round(seconds * 1000, 3)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, float]:
+        return dict(self.phases)
+
+
+class AsyncOnce:
+    """
+    Runs an async initializer once, on first use. Callers arriving while it
+    runs wait for the same run; if it fails, the next caller tries again
+    instead of the process being stuck with a broken import.
+    """
+
+    def __init__(self, init: Callable[[], Awaitable[None]]):
+        self._init = init
+        self._lock = asyncio.Lock()
+        self.done = False
+
+    async def __call__(self) -> None:
+        if self.done:
+            return
+        async with self._lock:
+            if not self.done:
+                await self._init()
+                self.done = True
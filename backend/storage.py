@@ -0,0 +1,355 @@
+"""
+Where chat sessions and cached responses live.
+
+StateBackend is the interface the endpoints use. LocalState keeps state in
+this process (or in the workers' shared SQLite database, see shared.py);
+RedisState keeps it in a Redis-protocol server so any number of replicas
+share sessions, cached answers and hit rates. Methods are async so a
+network backend never blocks the event loop.
+
+RedisState layout, under a configurable key prefix:
+
+    <prefix>session:<id>     list of serialized (user, bot) turns, trimmed
+                             to max_turns, expiring after idle_ttl
+    <prefix>summary:<id>     serialized rolling summary of the turns folded
+                             out of the session list (see summarize.py)
+    <prefix>response:<sha1>  serialized (expires_at, answer); the key lives
+                             stale_ttl longer so stale fallback still works
+
+Each request does one round trip to read (history, summary and cached
+answer, pipelined) and one to write its turn.
+"""
+import asyncio
+import hashlib
+import json
+import pickle
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from resp import RedisClient
+from sessions import Turn
+
+Summary = Dict[str, Any]
+
+# --- Serialization ---
+class Serializer:
+    def __init__(self, name: str, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+
+SERIALIZERS = {
+    # Compact and readable from any language; turns come back as lists.
+    "json": Serializer(
+        "json",
+        lambda value: json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        json.loads,
+    ),
+    # Faster for large values and keeps tuples, but only Python can read it
+    # and it must only be used with a trusted server.
+    "pickle": Serializer(
+        "pickle",
+        lambda value: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+        pickle.loads,
+    ),
+}
+
+
+def get_serializer(name: str) -> Serializer:
+    try:
+        return SERIALIZERS[name.lower()]
+    except KeyError:
+        raise RuntimeError(f"Unknown serializer '{name}' (expected {' or '.join(SERIALIZERS)})")
+
+
+# --- Backends ---
+class StateBackend:
+    """Sessions plus the first-turn response cache, behind one async interface."""
+
+    name = "base"
+    hits = 0
+    misses = 0
+
+    async def lookup(
+        self, session_id: str, cache_key: Hashable, serve_locally: Optional[Callable[[], bool]] = None
+    ) -> Tuple[List[Turn], Optional[Summary], Optional[str]]:
+        """
+        The session's history and summary and, for a first turn, the fresh
+        cached answer. serve_locally is called on the event loop for first
+        turns only; when it returns True the turn is answered without the
+        cache, which is then not consulted and counts neither hit nor miss.
+        """
+        raise NotImplementedError
+
+    async def conversation(self, session_id: str) -> Tuple[List[Turn], Optional[Summary]]:
+        raise NotImplementedError
+
+    async def append(self, session_id: str, user_message: str, bot_response: str) -> None:
+        raise NotImplementedError
+
+    async def fold(self, session_id: str, summary: Summary, folded: List[Turn]) -> bool:
+        """Replaces the oldest turns, if they are still `folded`, with `summary`."""
+        raise NotImplementedError
+
+    async def reset(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    async def get_stale(self, cache_key: Hashable) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set_response(self, cache_key: Hashable, response: str) -> None:
+        raise NotImplementedError
+
+    async def clear_responses(self) -> None:
+        """Called when the knowledge version changes; keys include the version anyway."""
+
+    async def sizes(self) -> Dict[str, int]:
+        """Cache entries, sessions and session bytes held by this backend, where it can tell."""
+        return {}
+
+    async def session_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def cache_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalState(StateBackend):
+    """Wraps a SessionStore and ResponseCache (or their SQLite-shared counterparts)."""
+
+    name = "memory"
+
+    def __init__(self, sessions, cache):
+        self.sessions = sessions
+        self.cache = cache
+        # The SQLite-shared stores wait on disk and on other workers' write
+        # locks, so their calls run in worker threads, never on the loop.
+        self._blocking = getattr(sessions, "blocking", False) or getattr(cache, "blocking", False)
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    @property
+    def hits(self) -> int:
+        return self.cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self.cache.misses
+
+    def _session(self, session_id: str) -> Tuple[List[Turn], Optional[Summary]]:
+        history = self.sessions.history(session_id)
+        return history, self.sessions.summary(session_id) if history else None
+
+    def _conversation(self, session_id: str) -> Tuple[List[Turn], Optional[Summary]]:
+        return self.sessions.history(session_id), self.sessions.summary(session_id)
+
+    async def lookup(
+        self, session_id: str, cache_key: Hashable, serve_locally: Optional[Callable[[], bool]] = None
+    ) -> Tuple[List[Turn], Optional[Summary], Optional[str]]:
+        history, summary = await self._run(self._session, session_id)
+        if history or (serve_locally is not None and serve_locally()):
+            return history, summary, None
+        return history, None, await self._run(self.cache.get, cache_key)
+
+    async def conversation(self, session_id: str) -> Tuple[List[Turn], Optional[Summary]]:
+        return await self._run(self._conversation, session_id)
+
+    async def append(self, session_id: str, user_message: str, bot_response: str) -> None:
+        await self._run(self.sessions.append, session_id, user_message, bot_response)
+
+    async def fold(self, session_id: str, summary: Summary, folded: List[Turn]) -> bool:
+        return await self._run(self.sessions.fold, session_id, summary, folded)
+
+    async def reset(self, session_id: str) -> bool:
+        return await self._run(self.sessions.reset, session_id)
+
+    async def get_stale(self, cache_key: Hashable) -> Optional[str]:
+        return await self._run(self.cache.get_stale, cache_key)
+
+    async def set_response(self, cache_key: Hashable, response: str) -> None:
+        await self._run(self.cache.set, cache_key, response)
+
+    async def clear_responses(self) -> None:
+        # Frees the entries that can no longer be hit.
+        await self._run(self.cache.clear)
+
+    def _sizes(self) -> Dict[str, int]:
+        return {
+            "cache_entries": len(self.cache),
+            "sessions": len(self.sessions),
+            "session_bytes": self.sessions.total_bytes,
+        }
+
+    async def sizes(self) -> Dict[str, int]:
+        return await self._run(self._sizes)
+
+    async def session_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, **await self._run(self.sessions.stats)}
+
+    async def cache_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, **await self._run(self.cache.stats)}
+
+
+class RedisState(StateBackend):
+    name = "redis"
+
+    def __init__(
+        self,
+        client: RedisClient,
+        serializer: Serializer,
+        prefix: str = "chat:",
+        max_turns: int = 10,
+        idle_ttl: float = 1800.0,
+        cache_ttl: float = 300.0,
+        stale_ttl: float = 3600.0,
+    ):
+        self.client = client
+        self.serializer = serializer
+        self.prefix = prefix
+        self.max_turns = max_turns
+        self.idle_ttl_ms = max(1, int(idle_ttl * 1000))
+        self.cache_ttl = cache_ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.resets = 0
+
+    def _session_key(self, session_id: str) -> str:
+        return f"{self.prefix}session:{session_id}"
+
+    def _summary_key(self, session_id: str) -> str:
+        return f"{self.prefix}summary:{session_id}"
+
+    def _response_key(self, cache_key: Hashable) -> str:
+        digest = hashlib.sha1(json.dumps(cache_key, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return f"{self.prefix}response:{digest}"
+
+    def _read_session(self, turns: List[bytes], summary: Optional[bytes]) -> Tuple[List[Turn], Optional[Summary]]:
+        history = [tuple(self.serializer.loads(turn)) for turn in turns]
+        return history, self.serializer.loads(summary) if summary is not None and history else None
+
+    async def lookup(
+        self, session_id: str, cache_key: Hashable, serve_locally: Optional[Callable[[], bool]] = None
+    ) -> Tuple[List[Turn], Optional[Summary], Optional[str]]:
+        # The cached entry is fetched in the same round trip either way, but
+        # only counted when it is actually consulted.
+        session_key, summary_key = self._session_key(session_id), self._summary_key(session_id)
+        turns, summary, entry, _, _ = await self.client.pipeline([
+            ("LRANGE", session_key, 0, -1),
+            ("GET", summary_key),
+            ("GET", self._response_key(cache_key)),
+            ("PEXPIRE", session_key, self.idle_ttl_ms),
+            ("PEXPIRE", summary_key, self.idle_ttl_ms),
+        ])
+        history, summary = self._read_session(turns, summary)
+        if history:
+            # Follow-ups never use the response cache.
+            return history, summary, None
+        if serve_locally is not None and serve_locally():
+            return history, None, None
+        if entry is not None:
+            expires_at, response = self.serializer.loads(entry)
+            if expires_at >= time.time():
+                self.hits += 1
+                return history, None, response
+        self.misses += 1
+        return history, None, None
+
+    async def conversation(self, session_id: str) -> Tuple[List[Turn], Optional[Summary]]:
+        turns, summary = await self.client.pipeline([
+            ("LRANGE", self._session_key(session_id), 0, -1),
+            ("GET", self._summary_key(session_id)),
+        ])
+        return self._read_session(turns, summary)
+
+    async def append(self, session_id: str, user_message: str, bot_response: str) -> None:
+        session_key = self._session_key(session_id)
+        await self.client.pipeline([
+            ("RPUSH", session_key, self.serializer.dumps((user_message, bot_response))),
+            ("LTRIM", session_key, -self.max_turns, -1),
+            ("PEXPIRE", session_key, self.idle_ttl_ms),
+            ("PEXPIRE", self._summary_key(session_id), self.idle_ttl_ms),
+        ])
+
+    async def fold(self, session_id: str, summary: Summary, folded: List[Turn]) -> bool:
+        session_key = self._session_key(session_id)
+        head = await self.client.execute("LRANGE", session_key, 0, len(folded) - 1)
+        if [tuple(self.serializer.loads(turn)) for turn in head] != [tuple(turn) for turn in folded]:
+            return False
+        # Appends only touch the tail, and folds start while the list still
+        # has room for one more turn, so a turn written between the check
+        # and the trim survives.
+        await self.client.pipeline([
+            ("SET", self._summary_key(session_id), self.serializer.dumps(summary), "PX", self.idle_ttl_ms),
+            ("LTRIM", session_key, len(folded), -1),
+        ])
+        return True
+
+    async def reset(self, session_id: str) -> bool:
+        removed = await self.client.delete(self._session_key(session_id), self._summary_key(session_id)) > 0
+        self.resets += removed
+        return removed
+
+    async def get_stale(self, cache_key: Hashable) -> Optional[str]:
+        entry = await self.client.get(self._response_key(cache_key))
+        if entry is None:
+            return None
+        self.stale_hits += 1
+        return self.serializer.loads(entry)[1]
+
+    async def set_response(self, cache_key: Hashable, response: str) -> None:
+        if self.cache_ttl <= 0:
+            return
+        entry = self.serializer.dumps((time.time() + self.cache_ttl, response))
+        await self.client.set(self._response_key(cache_key), entry, ttl=self.cache_ttl + self.stale_ttl)
+
+    async def session_stats(self) -> Dict[str, Any]:
+        # Session counts would need a keyspace scan; report this replica's view.
+        return {"backend": self.name, "max_turns": self.max_turns, "resets": self.resets, **self.client.stats()}
+
+    async def cache_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "ttl": self.cache_ttl,
+            "stale_ttl": self.stale_ttl,
+            "serializer": self.serializer.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def create_state(name: str, get_setting: Callable[[str, object], object], sessions=None, cache=None) -> StateBackend:
+    """Builds the backend named by STATE_BACKEND; `sessions` and `cache` back the memory one."""
+    name = name.lower()
+    if name == "memory":
+        return LocalState(sessions, cache)
+    if name == "redis":
+        client = RedisClient(
+            str(get_setting("REDIS_URL", "redis://localhost:6379/0")),
+            pool_size=int(get_setting("REDIS_POOL_SIZE", 16)),
+            timeout=float(get_setting("REDIS_TIMEOUT", 2)),
+        )
+        return RedisState(
+            client,
+            get_serializer(str(get_setting("STATE_SERIALIZER", "json"))),
+            prefix=str(get_setting("STATE_KEY_PREFIX", "chat:")),
+            max_turns=int(get_setting("SESSION_MAX_TURNS", 10)),
+            idle_ttl=float(get_setting("SESSION_IDLE_TTL", 1800)),
+            cache_ttl=float(get_setting("RESPONSE_CACHE_TTL", 300)),
+            stale_ttl=float(get_setting("RESPONSE_CACHE_STALE_TTL", 3600)),
+        )
+    raise RuntimeError(f"Unknown STATE_BACKEND '{name}' (expected memory or redis)")
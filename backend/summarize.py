@@ -0,0 +1,212 @@
+"""
+Rolling conversation summaries.
+
+Once a session's history passes trigger_tokens, or is one turn short of
+the cap where the store would start dropping turns, all but its
+keep_turns newest turns are folded into a running summary. Folding runs
+in a background task after the response has been sent, at most one per
+session at a time. Later requests send the summary (in the preamble)
+plus the recent turns instead of the whole history.
+
+A summary is a plain dict so every state backend can store it:
+
+    text           the summary itself, capped at max_tokens
+    turns          how many turns it covers in total
+    folded_tokens  prompt cost of the most recently folded turns, newest
+                   last, at most max_turns of them
+
+Without summaries a prompt would carry up to max_turns turns, so each
+request that uses a summary saves the cost of the folded turns that would
+still be in that window, minus the summary's own cost.
+"""
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from context import CHARS_PER_TOKEN, estimate_tokens, turn_tokens
+from logs import log
+from providers import LLMRequest
+from sessions import Turn
+
+
+SUMMARY_PREAMBLE = (
+    "You keep a running summary of a conversation between a user and a "
+    "business assistant. The documents hold the summary so far (if any) and "
+    "the turns to add to it. Reply with an updated summary only: what the "
+    "user asked and told, and what was answered. Leave out greetings and "
+    "repetition. Use at most {words} words."
+)
+
+
+def summary_section(summary: Optional[Dict[str, Any]]) -> str:
+    """Appended to the chat preamble when the session has a summary."""
+    if not summary:
+        return ""
+    return f"\n\nSummary of the earlier conversation:\n{summary['text']}"
+
+
+def fold_documents(summary: Optional[Dict[str, Any]], turns: List[Turn]) -> List[Dict[str, str]]:
+    documents = []
+    if summary:
+        documents.append({"title": "Summary so far", "text": summary["text"]})
+    for user_message, bot_response in turns:
+        documents.append({"title": "Turn", "text": f"User: {user_message}\nAssistant: {bot_response}"})
+    return documents
+
+
+def clip(text: str, max_tokens: int) -> str:
+    """Cuts text to about max_tokens at a word boundary."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip()
+
+
+def tokens_saved(summary: Dict[str, Any], history: List[Turn], max_turns: int) -> int:
+    """
+    Prompt tokens one request saves by sending `summary` instead of the
+    folded turns; negative when the summary costs more than they would.
+    """
+    window = max(0, max_turns - len(history))
+    folded = summary.get("folded_tokens", [])[-window:] if window else []
+    return sum(folded) - estimate_tokens(summary_section(summary))
+
+
+class Summarizer:
+    def __init__(
+        self,
+        state,
+        complete: Callable[[LLMRequest], Awaitable[Optional[str]]],
+        trigger_tokens: int = 1000,
+        keep_turns: int = 4,
+        max_turns: int = 10,
+        max_tokens: int = 250,
+        max_tracked: int = 10_000,
+    ):
+        self.state = state
+        self.complete = complete
+        self.trigger_tokens = trigger_tokens
+        self.keep_turns = max(1, keep_turns)
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.max_tracked = max_tracked
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        # Per-session savings seen by this process, least recently used first.
+        self._sessions: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self.folds = 0
+        self.turns_folded = 0
+        self.skipped = 0
+        self.failures = 0
+        self.conflicts = 0
+        self.requests = 0
+        self.tokens_saved = 0
+
+    def due(self, history: List[Turn]) -> bool:
+        if len(history) <= self.keep_turns:
+            return False
+        return len(history) >= self.max_turns - 1 or sum(turn_tokens(turn) for turn in history) >= self.trigger_tokens
+
+    def schedule(self, session_id: str, history: List[Turn], summary: Optional[Dict[str, Any]]) -> None:
+        """Starts a fold for a session whose history (including the new turn) is due."""
+        # What the store kept after appending the new turn.
+        history = history[-self.max_turns:]
+        if session_id in self._pending or not self.due(history):
+            return
+        self._pending.add(session_id)
+        task = asyncio.create_task(self._fold(session_id, history, summary))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, session_id: str, history: List[Turn], summary: Optional[Dict[str, Any]]) -> None:
+        folded = history[:-self.keep_turns]
+        try:
+            request = LLMRequest(
+                message="Update the summary with these turns.",
+                preamble=SUMMARY_PREAMBLE.format(words=self.max_tokens * 3 // 4),
+                documents=fold_documents(summary, folded),
+                temperature=0.0,
+            )
+            text = await self.complete(request)
+            if text is None:
+                # Upstream is busy or down; the next turn tries again.
+                self.skipped += 1
+                return
+            text = clip(text.strip(), self.max_tokens)
+            if not text:
+                raise ValueError("empty summary")
+            previous = summary or {}
+            updated = {
+                "text": text,
+                "turns": previous.get("turns", 0) + len(folded),
+                "folded_tokens": (previous.get("folded_tokens", []) + [turn_tokens(turn) for turn in folded])[-self.max_turns:],
+            }
+            if not await self.state.fold(session_id, updated, folded):
+                # The session was reset or trimmed meanwhile.
+                self.conflicts += 1
+                return
+        except Exception as e:
+            self.failures += 1
+            log.warning("summary_failed", session_id=session_id, error=repr(e))
+            return
+        finally:
+            self._pending.discard(session_id)
+        self.folds += 1
+        self.turns_folded += len(folded)
+        log.info(
+            "summary_folded",
+            session_id=session_id,
+            turns=len(folded),
+            folded_tokens=sum(updated["folded_tokens"][-len(folded):]),
+            summary_tokens=estimate_tokens(text),
+        )
+
+    def record_use(self, session_id: str, history: List[Turn], summary: Dict[str, Any]) -> int:
+        """Counts one upstream request sent with `summary`; returns the tokens it saved."""
+        saved = tokens_saved(summary, history, self.max_turns)
+        self.requests += 1
+        self.tokens_saved += saved
+        entry = self._sessions.pop(session_id, None) or {"requests": 0, "tokens_saved": 0}
+        entry["requests"] += 1
+        entry["tokens_saved"] += saved
+        self._sessions[session_id] = entry
+        while len(self._sessions) > self.max_tracked:
+            self._sessions.popitem(last=False)
+        return saved
+
+    def session_report(self, session_id: str, history: List[Turn], summary: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        usage = self._sessions.get(session_id, {"requests": 0, "tokens_saved": 0})
+        return {
+            "session_id": session_id,
+            "summary": summary["text"] if summary else None,
+            "turns_summarized": summary["turns"] if summary else 0,
+            "summary_tokens": estimate_tokens(summary_section(summary)),
+            "recent_turns": len(history),
+            "recent_tokens": sum(turn_tokens(turn) for turn in history),
+            "tokens_saved_per_request": tokens_saved(summary, history, self.max_turns) if summary else 0,
+            "pending": session_id in self._pending,
+            # Counted by this process only.
+            "requests_with_summary": usage["requests"],
+            "tokens_saved": usage["tokens_saved"],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "trigger_tokens": self.trigger_tokens,
+            "keep_turns": self.keep_turns,
+            "max_tokens": self.max_tokens,
+            "pending": len(self._pending),
+            "folds": self.folds,
+            "turns_folded": self.turns_folded,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "conflicts": self.conflicts,
+            "requests_with_summary": self.requests,
+            "tokens_saved": self.tokens_saved,
+            "avg_tokens_saved": round(self.tokens_saved / self.requests, 1) if self.requests else 0.0,
+        }
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
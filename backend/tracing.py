@@ -0,0 +1,179 @@
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from logs import BatchWriter, log
+
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    Timing record for one request. Spans are (name, start, end) tuples in
+    perf_counter seconds; marks are single timestamps used to derive spans
+    the handler cannot wrap itself (validation, serialization).
+    """
+
+    __slots__ = ("trace_id", "method", "path", "started", "wall_start", "spans", "marks", "attrs")
+
+    def __init__(self, method: str, path: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.wall_start = time.time()
+        self.spans: List[Tuple[str, float, float]] = []
+        self.marks: Dict[str, float] = {}
+        self.attrs: Dict[str, object] = {}
+
+    def add(self, name: str, start: float, end: float) -> None:
+        self.spans.append((name, start, end))
+
+    def durations(self) -> Dict[str, float]:
+        """Milliseconds per span name; repeated spans (e.g. retries) are summed."""
+        totals: Dict[str, float] = {}
+        for name, start, end in self.spans:
+            totals[name] = totals.get(name, 0.0) + (end - start) * 1000
+        return totals
+
+    def server_timing(self, now: float) -> str:
+        parts = [f"{name};dur={ms:.2f}" for name, ms in self.durations().items()]
+        parts.append(f"total;dur={(now - self.started) * 1000:.2f}")
+        return ", ".join(parts)
+
+    def to_record(self, status: int, end: float) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "ts": self.wall_start,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "duration_ms": round((end - self.started) * 1000, 3),
+            "spans": [
+                {"name": name, "start_ms": round((start - self.started) * 1000, 3), "duration_ms": round((end_ - start) * 1000, 3)}
+                for name, start, end_ in self.spans
+            ],
+            **self.attrs,
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter())
+
+
+def mark(name: str) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.marks[name] = time.perf_counter()
+
+
+def annotate(**attrs) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+class TraceExporter:
+    """
+    Appends finished traces to a JSONL file from a daemon thread.
+
+    submit() only does a non-blocking put on a bounded queue; when the
+    writer falls behind, records are dropped and counted rather than
+    slowing down request handling.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10_000, batch_size: int = 256, flush_interval: float = 1.0):
+        self.path = path
+        self.exported = 0
+        self._writer = BatchWriter("trace-exporter", self._write, self._failed, max_queue, batch_size, flush_interval)
+
+    @property
+    def dropped(self) -> int:
+        return self._writer.dropped
+
+    def submit(self, record: Dict) -> None:
+        self._writer.put(record)
+
+    def _write(self, batch: List[Dict]) -> None:
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        self.exported += len(batch)
+
+    def _failed(self, error: Exception, batch: List[Dict]) -> None:
+        log.warning("trace_export_failed", path=self.path, error=str(error))
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._writer.close(timeout)
+
+
+class TracingMiddleware:
+    """
+    Starts a Trace per HTTP request, adds a Server-Timing header when the
+    response starts and hands the finished trace to the exporter.
+
+    For streaming responses the header can only cover work done before the
+    first byte; the exported record covers the whole request.
+    """
+
+    def __init__(self, app, exporter: Optional[TraceExporter] = None):
+        self.app = app
+        self.exporter = exporter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+        token = _current.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                status = message["status"]
+                # Routing, body parsing and pydantic validation all happen
+                # before the handler body runs; serialization after it returns.
+                handler_start = trace.marks.get("handler_start")
+                if handler_start is not None:
+                    trace.add("validate", trace.started, handler_start)
+                handler_done = trace.marks.get("handler_done")
+                if handler_done is not None:
+                    trace.add("serialize", handler_done, now)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing(now).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if self.exporter is not None:
+                route = scope.get("route")
+                if route is not None:
+                    trace.path = getattr(route, "path", trace.path)
+                self.exporter.submit(trace.to_record(status, time.perf_counter()))
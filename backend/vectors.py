@@ -0,0 +1,212 @@
+"""
+Dense retrieval over knowledge chunks with a local hashing TF-IDF vectorizer.
+
+Each word and its character trigrams are hashed (crc32, so vectors are
+stable across processes and machines) into a fixed number of signed
+buckets, weighted by inverse document frequency and L2-normalized. The
+trigrams let "conferencing" match "conference" and similar paraphrases
+that exact keyword matching misses. No model files or network access are
+needed.
+
+All chunk vectors live in one contiguous float32 matrix, so a query is a
+single matrix-vector product followed by an argpartition top-k. Matrices
+are saved as .npy next to a store and can be memory-mapped on load.
+
+    python vectors.py knowledge.zks --dim 256
+"""
+import argparse
+import json
+import os
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from retrieval import document_terms, tokenize
+
+
+class HashingVectorizer:
+    """Maps text to a signed, hashed bag of words and character trigrams."""
+
+    def __init__(self, dim: int = 256, cache_size: int = 200_000):
+        if dim & (dim - 1):
+            raise ValueError("dim must be a power of two")
+        self.dim = dim
+        self.cache_size = cache_size
+        self._features: Dict[str, Tuple[List[int], List[float]]] = {}
+
+    def _token_features(self, token: str) -> Tuple[List[int], List[float]]:
+        cached = self._features.get(token)
+        if cached is not None:
+            return cached
+        padded = f"<{token}>"
+        grams = [token] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+        buckets, signs = [], []
+        for gram in grams:
+            h = zlib.crc32(gram.encode("utf-8"))
+            # Low bits pick the bucket, the top bit the sign, so collisions
+            # cancel out on average instead of always adding up.
+            buckets.append(h & (self.dim - 1))
+            signs.append(-1.0 if h & 0x80000000 else 1.0)
+        # An exact word match counts as two shared trigrams.
+        signs[0] *= 2
+        if len(self._features) < self.cache_size:
+            self._features[token] = (buckets, signs)
+        return buckets, signs
+
+    def transform_terms(self, terms: Sequence[str]) -> np.ndarray:
+        """Raw (unweighted) term-frequency vector for already tokenized text."""
+        buckets: List[int] = []
+        weights: List[float] = []
+        for term in terms:
+            token_buckets, token_signs = self._token_features(term)
+            buckets.extend(token_buckets)
+            weights.extend(token_signs)
+        if not buckets:
+            return np.zeros(self.dim, dtype=np.float32)
+        return np.bincount(buckets, weights, minlength=self.dim).astype(np.float32)
+
+
+def _normalize_rows(matrix: np.ndarray) -> None:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+
+class DenseIndex:
+    """
+    Contiguous (n_chunks, dim) float32 matrix of TF-IDF vectors plus the
+    idf weights needed to embed queries the same way. `documents` is any
+    sequence of chunk dicts (a list, or a ChunkStore).
+    """
+
+    def __init__(self, matrix: np.ndarray, idf: np.ndarray, documents: Sequence[Dict], vectorizer: HashingVectorizer):
+        self.matrix = matrix
+        self.idf = idf
+        self.documents = documents
+        self.vectorizer = vectorizer
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        documents: Sequence[Dict],
+        dim: int = 256,
+        out: Optional[str] = None,
+        version: str = "",
+        block: int = 8192
+    ) -> "DenseIndex":
+        """
+        Vectorizes every document. With `out`, the matrix is written straight
+        into an .npy memmap (so a 1M-chunk corpus never needs to fit in RAM)
+        and the idf weights and source version go to a sidecar; see load().
+        """
+        vectorizer = HashingVectorizer(dim)
+        n = len(documents)
+        if out:
+            matrix = np.lib.format.open_memmap(out + ".tmp", mode="w+", dtype=np.float32, shape=(n, dim))
+        else:
+            matrix = np.empty((n, dim), dtype=np.float32)
+        df = np.zeros(dim, dtype=np.int64)
+        for i, doc in enumerate(documents):
+            row = vectorizer.transform_terms(document_terms(doc))
+            # Sublinear tf keeps one repeated word from dominating a chunk.
+            np.copyto(matrix[i], np.sign(row) * np.log1p(np.abs(row)))
+            df += row != 0
+
+        idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        for start in range(0, n, block):
+            rows = matrix[start:start + block]
+            rows *= idf
+            _normalize_rows(rows)
+
+        if out:
+            matrix.flush()
+            del matrix
+            os.replace(out + ".tmp", out)
+            np.savez(_meta_path(out), idf=idf, version=np.array(version))
+            return cls.load(out, documents, version, mmap=True)
+        return cls(matrix, idf, documents, vectorizer)
+
+    @classmethod
+    def load(cls, path: str, documents: Sequence[Dict], version: str = "", mmap: bool = True) -> "DenseIndex":
+        with np.load(_meta_path(path)) as meta:
+            idf, built_from = meta["idf"], str(meta["version"])
+        if version and built_from != version:
+            raise ValueError(f"{path} was built for version {built_from}, not {version}; rebuild it")
+        matrix = np.load(path, mmap_mode="r" if mmap else None)
+        if matrix.shape[0] != len(documents):
+            raise ValueError(f"{path} has {matrix.shape[0]} vectors for {len(documents)} chunks; rebuild it")
+        return cls(matrix, idf, documents, HashingVectorizer(matrix.shape[1]))
+
+    def embed(self, query: str) -> np.ndarray:
+        row = self.vectorizer.transform_terms(tokenize(query))
+        vector = np.sign(row) * np.log1p(np.abs(row)) * self.idf
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def search(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Tuple[Dict, float]]:
+        n = len(self)
+        if not n or top_k <= 0:
+            return []
+        scores = self.matrix @ self.embed(query)
+        if top_k < n:
+            # argpartition is O(n); only the k winners get sorted.
+            candidates = np.argpartition(scores, n - top_k)[n - top_k:]
+        else:
+            candidates = np.arange(n)
+        ranked = candidates[np.argsort(scores[candidates])[::-1]]
+        return [(self.documents[int(i)], float(scores[i])) for i in ranked if scores[i] > 0 and scores[i] >= min_score]
+
+    def top_documents(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Dict]:
+        return [doc for doc, _ in self.search(query, top_k, min_score)]
+
+
+def _meta_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".meta.npz"
+
+
+def vectors_path(store_path: str) -> str:
+    """Where the dense matrix for a .zks store lives."""
+    return os.path.splitext(store_path)[0] + ".vec.npy"
+
+
+def fuse(rankings: Iterable[List[Dict]], top_k: int, k: int = 60) -> List[Dict]:
+    """Reciprocal rank fusion: merges ranked lists without comparing their raw scores."""
+    # Stores decode a fresh dict per lookup, so documents are matched by content.
+    scores: Dict[Tuple, float] = {}
+    docs: Dict[Tuple, Dict] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = (doc.get("title"), doc.get("text"))
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank + 1)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [docs[key] for key in best]
+
+
+def main():
+    from chunkstore import ChunkStore
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("store", help="a .zks chunk store (see chunkstore.py)")
+    parser.add_argument("--dim", type=int, default=256, help="vector size (power of two)")
+    args = parser.parse_args()
+
+    store = ChunkStore(args.store)
+    started = time.perf_counter()
+    index = DenseIndex.build(store, args.dim, out=vectors_path(args.store), version=store.version)
+    print(json.dumps({
+        "chunks": len(index),
+        "dim": args.dim,
+        "path": vectors_path(args.store),
+        "mb": round(index.matrix.nbytes / 2**20, 1),
+        "build_s": round(time.perf_counter() - started, 3),
+    }))
+
+
+if __name__ == "__main__":
+    main()